@@ -1,60 +1,1060 @@
-from flask import Flask, render_template, request, redirect, abort
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import click
+from flask import (Blueprint, Flask, current_app, render_template, request, redirect, abort, jsonify, make_response,
+                   url_for, get_template_attribute, g, has_request_context, Response, send_from_directory,
+                   stream_with_context)
 from flask_sqlalchemy import SQLAlchemy
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+from sqlalchemy import event
+from werkzeug.security import safe_join
+from group_commit import GroupCommitWriter
+from bulk import apply_bulk, iter_json_array, iter_ndjson, spool
+from page_cache import PageCache
+from fragment_cache import FragmentCache
+from metrics import Metrics
+from seeding import seed_todos
+from assets import VENDORED, build, load_manifest, vendor
+from compression import CompressionMiddleware
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///todo.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+DEFAULT_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': "sqlite:///todo.db",
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'TODO_PAGE_SIZE': 50,
+    'TODO_MAX_PAGE_SIZE': 500,
+    # Search ranks only the newest this-many matches, so a common word costs
+    # about as much as a rare one. Pages past them come back empty.
+    'TODO_SEARCH_CANDIDATES': 1000,
+    # SQLite connection tuning, applied to every new connection. Set a value
+    # to None to keep SQLite's default for that pragma.
+    'SQLITE_JOURNAL_MODE': "WAL",
+    'SQLITE_BUSY_TIMEOUT': 5000,  # milliseconds
+    'SQLITE_SYNCHRONOUS': "NORMAL",
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,  # bytes
+    'SQLITE_CACHE_SIZE': -20000,  # negative means KiB
+    'SQLITE_TEMP_STORE': "MEMORY",
+    # Group commit: merge task inserts that arrive within a few ms into a
+    # single transaction instead of one commit (and one fsync) per POST.
+    'TODO_GROUP_COMMIT': False,
+    'TODO_GROUP_COMMIT_WINDOW_MS': 5,
+    'TODO_GROUP_COMMIT_MAX_ROWS': 64,
+    # Number of bulk API operations parsed and applied per executemany batch.
+    'TODO_BULK_CHUNK_SIZE': 1000,
+    # Rendered index pages are cached per data version; turn off with
+    # FLASK_TODO_PAGE_CACHE=false.
+    'TODO_PAGE_CACHE': True,
+    'TODO_PAGE_CACHE_MAX_BYTES': 32 * 1024 * 1024,
+    # Rendered table rows are cached per (sno, version), so a page that
+    # misses the page cache only renders the rows that changed. The size is
+    # counted in characters of HTML.
+    'TODO_ROW_CACHE': True,
+    'TODO_ROW_CACHE_MAX_SIZE': 16 * 1024 * 1024,
+    # Streaming mode renders the index page chunk by chunk from a server-side
+    # cursor, bypassing the page cache. Memory stays flat, so pages can be
+    # much larger than in buffered mode.
+    'TODO_STREAM_INDEX': False,
+    'TODO_STREAM_MAX_PAGE_SIZE': 100000,
+    'TODO_STREAM_YIELD_PER': 500,
+    # Streamed output is flushed once this many characters have been
+    # rendered, so the page head and the first rows go out straight away.
+    'TODO_STREAM_CHUNK_SIZE': 16 * 1024,
+    # Table rows are rendered and joined this many at a time. Kept small so
+    # one batch never holds up a streamed chunk.
+    'TODO_ROW_BATCH_SIZE': 25,
+    # Request metrics served at /metrics. Under gunicorn, point
+    # TODO_METRICS_DIR at a directory shared by the workers so the numbers
+    # cover all of them.
+    'TODO_METRICS': True,
+    'TODO_METRICS_DIR': None,
+    'TODO_METRICS_FLUSH_SECONDS': 1.0,
+    # Per-request SQL statement counts and time, reported in a Server-Timing
+    # header. Statements slower than the threshold are logged with their
+    # query plan to TODO_SLOW_QUERY_LOG (or the app log when that is None).
+    'TODO_SQL_TIMING': True,
+    'TODO_SLOW_QUERY_SECONDS': 0.1,
+    'TODO_SLOW_QUERY_LOG': None,
+    # Fingerprinted copies of static/ made by `flask build-assets`, served
+    # from /assets/ with far-future cache headers. None means dist/ next to
+    # this file.
+    'TODO_ASSETS_DIR': None,
+    'TODO_ASSETS_MAX_AGE': 365 * 24 * 3600,  # seconds
+    # Compiled templates are kept on disk, so a new worker loads them instead
+    # of lexing and compiling each one on its first render. Fill the cache
+    # at build time with `flask precompile-templates`. None means
+    # instance/jinja-cache/.
+    'TODO_TEMPLATE_CACHE': True,
+    'TODO_TEMPLATE_CACHE_DIR': None,
+    # gzip/deflate for responses of at least TODO_COMPRESSION_MIN_SIZE bytes,
+    # negotiated per request. Built assets use their precompressed .gz files.
+    'TODO_COMPRESSION': True,
+    'TODO_COMPRESSION_MIN_SIZE': 1024,  # bytes
+    'TODO_COMPRESSION_LEVEL': 6,
+    # Create or upgrade the schema before the first request (or CLI command)
+    # each process handles. When off, run `flask init-db` at deploy time and
+    # processes start without touching the database at all.
+    'TODO_AUTO_INIT_DB': True,
+    # When on, /ready answers 503 until warm_up() has run in this process
+    # (gunicorn.conf.py runs it before each worker takes traffic). The
+    # paths are requested in-process; the update page of the first task and
+    # the 404 page are always added.
+    'TODO_WARM_UP': False,
+    'TODO_WARM_UP_PATHS': ('/', '/?show=all', '/?after=1', '/?before=2', '/search?q=warmup'),
+}
+
+# Overrides applied on top of DEFAULT_CONFIG. The profile comes from
+# create_app(profile), else FLASK_TODO_PROFILE, else 'development'.
+CONFIG_PROFILES = {
+    'development': {},
+    'production': {'TODO_AUTO_INIT_DB': False, 'TODO_WARM_UP': True},
+    'testing': {'TESTING': True, 'TODO_METRICS_DIR': None},
+}
+
+db = SQLAlchemy()
 
 class Todo(db.Model):
     sno = db.Column(db.Integer, primary_key=True)
     task = db.Column(db.String(200), nullable=False)
     description = db.Column(db.String(500), nullable=False)
+    # Bumped on every change to the row; used for the update page's ETag and
+    # to detect conflicting edits. ORM flushes check and bump it themselves;
+    # Core UPDATE statements must do both explicitly.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    done = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+    completed_at = db.Column(db.DateTime)
+
+    __mapper_args__ = {'version_id_col': version}
+    # AUTOINCREMENT: a deleted task's sno is never handed out again, so
+    # (sno, version) names one state of one task for good. ETags, stale
+    # update forms and the row cache all rely on that.
+    __table_args__ = {'sqlite_autoincrement': True}
 
     def __repr__(self) -> str:
         return f"{self.task} - {self.description}"
 
-with app.app_context():
+# Columns added after the first release. db.create_all() never alters an
+# existing table, so older databases get them through ALTER TABLE.
+ADDED_COLUMNS = [
+    ('version', "version INTEGER NOT NULL DEFAULT 1"),
+    ('done', "done BOOLEAN NOT NULL DEFAULT 0"),
+    ('completed_at', "completed_at DATETIME"),
+]
+
+# Schema objects db.create_all() does not know about. Every statement is
+# idempotent so this can run against new and existing databases alike.
+SCHEMA_EXTRAS = [
+    # Row count kept up to date by triggers so the header total never needs a
+    # COUNT(*) scan of the whole table.
+    "CREATE TABLE IF NOT EXISTS todo_count (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO todo_count (id, total) SELECT 1, COUNT(*) FROM todo",
+    "CREATE TRIGGER IF NOT EXISTS todo_count_insert AFTER INSERT ON todo "
+    "BEGIN UPDATE todo_count SET total = total + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_count_delete AFTER DELETE ON todo "
+    "BEGIN UPDATE todo_count SET total = total - 1 WHERE id = 1; END",
+    # Open tasks only: the default list view is a range scan of this index,
+    # so its cost follows the number of open tasks, not all of history.
+    "CREATE INDEX IF NOT EXISTS todo_open ON todo (sno) WHERE done = 0",
+    "CREATE TABLE IF NOT EXISTS todo_open_count (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO todo_open_count (id, total) SELECT 1, COUNT(*) FROM todo WHERE done = 0",
+    "CREATE TRIGGER IF NOT EXISTS todo_open_count_insert AFTER INSERT ON todo WHEN new.done = 0 "
+    "BEGIN UPDATE todo_open_count SET total = total + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_open_count_delete AFTER DELETE ON todo WHEN old.done = 0 "
+    "BEGIN UPDATE todo_open_count SET total = total - 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_open_count_update AFTER UPDATE OF done ON todo WHEN old.done != new.done "
+    "BEGIN UPDATE todo_open_count SET total = total + CASE WHEN new.done THEN -1 ELSE 1 END WHERE id = 1; END",
+    # Data version bumped by every committed write to todo, whichever worker
+    # or code path made it. Cached pages are keyed on it.
+    "CREATE TABLE IF NOT EXISTS todo_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO todo_version (id, version) VALUES (1, 0)",
+    "CREATE TRIGGER IF NOT EXISTS todo_version_insert AFTER INSERT ON todo "
+    "BEGIN UPDATE todo_version SET version = version + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_version_update AFTER UPDATE ON todo "
+    "BEGIN UPDATE todo_version SET version = version + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS todo_version_delete AFTER DELETE ON todo "
+    "BEGIN UPDATE todo_version SET version = version + 1 WHERE id = 1; END",
+    # Full-text index over task and description. It is an external-content
+    # table, so the text itself is only stored once, in todo.
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todo_fts USING fts5("
+    "task, description, content='todo', content_rowid='sno', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_insert AFTER INSERT ON todo BEGIN "
+    "INSERT INTO todo_fts (rowid, task, description) VALUES (new.sno, new.task, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_delete AFTER DELETE ON todo BEGIN "
+    "INSERT INTO todo_fts (todo_fts, rowid, task, description) VALUES ('delete', old.sno, old.task, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_update AFTER UPDATE OF task, description ON todo BEGIN "
+    "INSERT INTO todo_fts (todo_fts, rowid, task, description) VALUES ('delete', old.sno, old.task, old.description); "
+    "INSERT INTO todo_fts (rowid, task, description) VALUES (new.sno, new.task, new.description); END",
+]
+
+SQLITE_PRAGMAS = ['journal_mode', 'busy_timeout', 'synchronous', 'mmap_size', 'cache_size', 'temp_store']
+
+def apply_sqlite_pragmas(config, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        value = config.get(f"SQLITE_{pragma.upper()}")
+        if value is not None:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+slow_query_log = logging.getLogger('todo.slow_query')
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def record_query(slow_seconds, conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context():
+        g.sql_count = g.get('sql_count', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+        if 'metrics_start' in g:  # i.e. start_request_timer counts this request
+            current_metrics().inc('todo_sql_statements_total', {'endpoint': g.metrics_endpoint})
+            current_metrics().inc('todo_sql_seconds_total', {'endpoint': g.metrics_endpoint}, elapsed)
+    if elapsed >= slow_seconds:
+        log_slow_query(cursor, statement, parameters[0] if executemany else parameters, elapsed)
+
+def discard_query_timer(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so it does not stay behind on the pooled connection.
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def add_slow_query_log(path):
+    # The logger is process-wide, so apps logging to the same file share
+    # one handler instead of each adding another.
+    path = os.path.abspath(path)
+    if not any(getattr(handler, 'baseFilename', None) == path for handler in slow_query_log.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        slow_query_log.addHandler(handler)
+    slow_query_log.setLevel(logging.WARNING)
+
+def log_slow_query(cursor, statement, parameters, elapsed):
+    try:
+        plan = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        plan = '\n'.join(f"    {row[-1]}" for row in plan)
+    except Exception as exc:  # e.g. statements EXPLAIN does not accept
+        plan = f"    (no plan: {exc})"
+    endpoint = request.endpoint if has_request_context() else None
+    slow_query_log.warning("%.1f ms [%s] %s\n%s", elapsed * 1000, endpoint, statement, plan)
+
+def init_schema():
+    """Create the schema, or bring an existing database up to date.
+
+    Every step is idempotent, so this is safe to run on every deploy.
+    """
     db.create_all()
+    with db.engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(todo)")}
+        for name, ddl in ADDED_COLUMNS:
+            if name not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE todo ADD COLUMN {ddl}")
+        table_sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'todo'").scalar()
+        if 'AUTOINCREMENT' not in table_sql.upper():
+            rebuild_with_autoincrement(conn)
+        has_search_index = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'todo_fts'").first()
+        for statement in SCHEMA_EXTRAS:
+            conn.exec_driver_sql(statement)
+        if not has_search_index:
+            # The update/delete triggers assume every row is already indexed,
+            # so an index added to an existing database must be filled first.
+            conn.exec_driver_sql("INSERT INTO todo_fts (todo_fts) VALUES ('rebuild')")
+
+def rebuild_with_autoincrement(conn):
+    # SQLite cannot add AUTOINCREMENT to an existing table, so copy the rows
+    # into a new one. The old table's indexes and triggers go with it and
+    # SCHEMA_EXTRAS creates them again; snos are kept, so the search index
+    # stays valid. snos deleted before this point may still be reused once.
+    conn.exec_driver_sql("ALTER TABLE todo RENAME TO todo_before_autoincrement")
+    Todo.__table__.create(conn)
+    columns = ', '.join(column.name for column in Todo.__table__.columns)
+    conn.exec_driver_sql(f"INSERT INTO todo ({columns}) SELECT {columns} FROM todo_before_autoincrement")
+    conn.exec_driver_sql("DROP TABLE todo_before_autoincrement")
+
+schema_lock = threading.Lock()
+
+def ensure_schema():
+    # Lazy counterpart of `flask init-db`: runs once per app and process.
+    app = current_app._get_current_object()
+    if not app.config['TODO_AUTO_INIT_DB'] or app.extensions.get('todo_schema_ready'):
+        return
+    with schema_lock:
+        if not app.extensions.get('todo_schema_ready'):
+            init_schema()
+            app.extensions['todo_schema_ready'] = True
+
+@functools.cache
+def render_digest(template_folder, out_dir):
+    digest = hashlib.sha1(json.dumps(asset_manifest(out_dir), sort_keys=True).encode())
+    for name in sorted(os.listdir(template_folder)):
+        with open(os.path.join(template_folder, name), 'rb') as f:
+            digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()[:12]
+
+def templates_digest():
+    # Part of every ETag, so a deploy that changes the templates, or the
+    # assets they link to, never answers 304 for a page rendered by the old
+    # ones. Read once per process.
+    return render_digest(os.path.join(current_app.root_path, current_app.template_folder), assets_dir())
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that creates its directory on first write,
+    and never fails a render over a write it cannot make (e.g. a read-only
+    deploy): the template is then just compiled in memory, as without it.
+
+    Entries are keyed on the template name alone, not its absolute path, so
+    a cache filled at build time (in /tmp/build_*, say) still serves the app
+    once it runs from /app. Each entry carries its source's checksum, so a
+    changed template is recompiled rather than served stale.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+    def dump_bytecode(self, bucket):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+def template_cache_dir(app):
+    return app.config['TODO_TEMPLATE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja-cache')
+
+def assets_dir():
+    return current_app.config['TODO_ASSETS_DIR'] or os.path.join(current_app.root_path, 'dist')
+
+@functools.cache
+def asset_manifest(out_dir):
+    # Read once per process: a new build is deployed with a restart.
+    return load_manifest(out_dir)
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# name, kind, help text
+METRIC_DESCRIPTIONS = [
+    ('todo_http_requests_total', 'counter', "HTTP requests by endpoint, method and status code."),
+    ('todo_http_request_duration_seconds', 'histogram', "Time spent handling a request, by endpoint."),
+    ('todo_http_requests_in_flight', 'gauge', "Requests currently being handled, by endpoint."),
+    ('todo_sql_statements_total', 'counter', "SQL statements executed while handling requests, by endpoint."),
+    ('todo_sql_seconds_total', 'counter', "Time spent executing SQL statements while handling requests, by endpoint."),
+    ('todo_page_cache_hits_total', 'counter', "Index page renders served from the page cache."),
+    ('todo_page_cache_misses_total', 'counter', "Index page renders that missed the page cache."),
+    ('todo_page_cache_evictions_total', 'counter', "Pages evicted from the page cache to stay within its size bound."),
+    ('todo_row_cache_hits_total', 'counter', "Table rows served from the row cache."),
+    ('todo_row_cache_misses_total', 'counter', "Table rows rendered because they were not in the row cache."),
+    ('todo_row_cache_evictions_total', 'counter', "Rows evicted from the row cache to stay within its size bound."),
+    ('todo_group_commit_batches_total', 'counter', "Group-commit transactions written."),
+    ('todo_group_commit_rows_total', 'counter', "Rows inserted through group commit; divide by batches for the mean batch size."),
+    ('todo_group_commit_wait_seconds_total', 'counter', "Time inserts spent waiting for their batch to commit; divide by rows for the mean wait."),
+    ('todo_compression_responses_total', 'counter', "Responses compressed on the fly, by encoding."),
+    ('todo_compression_bytes_in_total', 'counter', "Bytes before on-the-fly compression; divide by bytes out for the ratio."),
+    ('todo_compression_bytes_out_total', 'counter', "Bytes after on-the-fly compression."),
+    ('todo_compression_cpu_seconds_total', 'counter', "CPU time spent compressing responses."),
+    ('todo_precompressed_responses_total', 'counter', "Built assets served from their precompressed .gz file."),
+]
+
+def init_helpers(app, engine):
+    """Create the app's caches, group-commit writer and metrics.
+
+    Each app gets its own, kept in app.extensions, so two apps in one
+    process never share cached pages or a database engine. Requests reach
+    them through the current_* functions below.
+    """
+    page_cache = PageCache(app.config['TODO_PAGE_CACHE_MAX_BYTES'])
+    row_cache = FragmentCache(app.config['TODO_ROW_CACHE_MAX_SIZE'])
+    group_writer = GroupCommitWriter(
+        lambda: engine, Todo.__table__,
+        window=app.config['TODO_GROUP_COMMIT_WINDOW_MS'] / 1000,
+        max_rows=app.config['TODO_GROUP_COMMIT_MAX_ROWS'],
+    )
+    metrics = Metrics(app.config['TODO_METRICS_DIR'], app.config['TODO_METRICS_FLUSH_SECONDS'])
+    for name, kind, help_text in METRIC_DESCRIPTIONS:
+        metrics.describe(name, kind, help_text)
+    metrics.add_collector(lambda: [
+        (f'todo_page_cache_{name}_total', {}, page_cache.stats()[name]) for name in ('hits', 'misses', 'evictions')
+    ])
+    metrics.add_collector(lambda: [
+        (f'todo_row_cache_{name}_total', {}, row_cache.stats()[name]) for name in ('hits', 'misses', 'evictions')
+    ])
+    metrics.add_collector(lambda: [
+        ('todo_group_commit_batches_total', {}, group_writer.stats()['batches']),
+        ('todo_group_commit_rows_total', {}, group_writer.stats()['rows']),
+        ('todo_group_commit_wait_seconds_total', {}, group_writer.stats()['wait_seconds_total']),
+    ])
+    app.extensions.update(
+        todo_page_cache=page_cache,
+        todo_row_cache=row_cache,
+        todo_group_writer=group_writer,
+        todo_metrics=metrics,
+    )
+
+def current_page_cache():
+    return current_app.extensions['todo_page_cache']
+
+def current_row_cache():
+    return current_app.extensions['todo_row_cache']
+
+def current_group_writer():
+    return current_app.extensions['todo_group_writer']
+
+def current_metrics():
+    return current_app.extensions['todo_metrics']
+
+bp = Blueprint('todo', __name__, cli_group=None)
+
+def record_compression(metrics, encoding, bytes_in, bytes_out, cpu_seconds):
+    # Called as the body is sent, after the request context is gone.
+    metrics.inc('todo_compression_responses_total', {'encoding': encoding})
+    metrics.inc('todo_compression_bytes_in_total', {'encoding': encoding}, bytes_in)
+    metrics.inc('todo_compression_bytes_out_total', {'encoding': encoding}, bytes_out)
+    metrics.inc('todo_compression_cpu_seconds_total', {'encoding': encoding}, cpu_seconds)
+
+@bp.before_app_request
+def init_schema_lazily():
+    ensure_schema()
+
+@bp.before_app_request
+def start_request_timer():
+    if not current_app.config['TODO_METRICS'] or request.environ.get(WARM_UP_ENVIRON_KEY):
+        return
+    metrics = current_metrics()
+    metrics.ensure_process()
+    g.metrics_endpoint = request.endpoint or 'not_found'
+    g.metrics_start = time.perf_counter()
+    metrics.gauge_add('todo_http_requests_in_flight', {'endpoint': g.metrics_endpoint}, 1)
+
+@bp.after_app_request
+def add_server_timing(response):
+    if 'sql_count' in g:
+        response.headers.add('Server-Timing', f'db;desc="{g.sql_count} queries";dur={g.sql_seconds * 1000:.2f}')
+    return response
+
+@bp.after_app_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@bp.teardown_app_request
+def record_request_metrics(exc):
+    if 'metrics_start' not in g:
+        return
+    metrics = current_metrics()
+    endpoint = g.metrics_endpoint
+    status = 500 if exc is not None else g.get('metrics_status', 500)
+    metrics.observe('todo_http_request_duration_seconds', {'endpoint': endpoint}, time.perf_counter() - g.metrics_start)
+    metrics.inc('todo_http_requests_total', {'endpoint': endpoint, 'method': request.method, 'status': status})
+    metrics.gauge_add('todo_http_requests_in_flight', {'endpoint': endpoint}, -1)
+
+# Set on warm_up()'s requests, which are left out of the request metrics.
+WARM_UP_ENVIRON_KEY = 'todo.warm_up'
+
+def warm_up(app):
+    """Run the hot requests once in-process, before this process takes traffic.
+
+    That opens the pool's database connection, compiles the SQL statements,
+    loads the templates and fills the row and page caches, so real requests
+    do not pay for any of it. Returns the seconds it took; /ready reports
+    ready from then on.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        first = db.session.execute(db.select(Todo.sno).order_by(Todo.sno).limit(1)).scalar()
+    paths = [*app.config['TODO_WARM_UP_PATHS'], f'/update/{first or 0}', '/update/0']
+    client = app.test_client()
+    for path in paths:
+        response = client.get(path, environ_base={WARM_UP_ENVIRON_KEY: True})
+        response.get_data()  # a streamed page only renders as it is read
+        response.close()
+        if response.status_code >= 500:
+            app.logger.warning("Warm-up request %s failed with %s", path, response.status)
+    app.extensions['todo_warm_up_seconds'] = time.perf_counter() - start
+    return app.extensions['todo_warm_up_seconds']
+
+def data_version():
+    return db.session.execute(db.text("SELECT version FROM todo_version WHERE id = 1")).scalar() or 0
+
+def todo_total():
+    return db.session.execute(db.text("SELECT total FROM todo_count WHERE id = 1")).scalar() or 0
+
+def open_total():
+    return db.session.execute(db.text("SELECT total FROM todo_open_count WHERE id = 1")).scalar() or 0
+
+# SQLite integers are signed 64-bit; binding a larger Python int overflows.
+SQLITE_MAX_INT = 2 ** 63 - 1
+
+def int_arg(name, minimum=0, maximum=SQLITE_MAX_INT):
+    """Query parameter ``name`` as an int, or None if it is missing or not one.
+
+    A number outside [minimum, maximum] answers 400, rather than reaching
+    SQLite or building links to pages that cannot exist.
+    """
+    value = request.args.get(name, type=int)
+    if value is not None and not minimum <= value <= maximum:
+        abort(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+def page_limit(stream=False):
+    max_size = current_app.config['TODO_STREAM_MAX_PAGE_SIZE' if stream else 'TODO_MAX_PAGE_SIZE']
+    limit = request.args.get('limit', current_app.config['TODO_PAGE_SIZE'], type=int)
+    return max(1, min(limit, max_size))
+
+class TodoPage:
+    """One keyset page of todos, iterated lazily in sno order.
+
+    The rows may be a server-side cursor, so next_after is only known once
+    the page has been iterated; templates must read it after the loop.
+    """
+
+    def __init__(self, rows, limit, has_prev, has_next, after=None):
+        self._rows = iter(rows)
+        self._first = next(self._rows, None)
+        self.limit = limit
+        self.has_next = has_next
+        self.prev_before = None
+        self.next_after = None
+        if has_prev:
+            self.prev_before = self._first.sno if self._first is not None else after + 1
+
+    def __bool__(self):
+        return self._first is not None
 
-@app.route('/', methods=['GET', 'POST'])
+    def __iter__(self):
+        row, count, last = self._first, 0, None
+        while row is not None and count < self.limit:
+            yield row
+            last, count = row, count + 1
+            row = next(self._rows, None)
+        if last is not None and (row is not None or self.has_next):
+            self.next_after = last.sno
+
+# The list view only shows these columns. Selecting them as plain rows skips
+# ORM instance construction, attribute instrumentation and the identity map.
+LIST_COLUMNS = (Todo.sno, Todo.task, Todo.description, Todo.done, Todo.version)
+
+# Spelled exactly like the todo_open index's WHERE clause (a literal 0, not
+# a bound parameter), which SQLite needs to see before it will use the index.
+OPEN = Todo.done == db.false()
+
+def todo_page(after=None, before=None, limit=50, stream=False, open_only=True):
+    """Keyset page over Todo.sno: one indexed range scan of limit + 1 rows.
+
+    Rows are named tuples of LIST_COLUMNS, not Todo instances. With
+    stream=True they come from a server-side cursor instead of being loaded
+    up front. open_only pages through the todo_open partial index.
+    """
+    statement = db.select(*LIST_COLUMNS)
+    cursor = db.select(Todo.sno)
+    if open_only:
+        statement, cursor = statement.where(OPEN), cursor.where(OPEN)
+    has_prev, has_next = bool(after), False
+    if before is not None:
+        # Walk back limit rows from the cursor to find where the page starts.
+        after = db.session.execute(
+            cursor.where(Todo.sno < before).order_by(Todo.sno.desc()).limit(1).offset(limit)
+        ).scalar()
+        has_prev, has_next = after is not None, True
+        statement = statement.where(Todo.sno < before)
+    if after is not None:
+        statement = statement.where(Todo.sno > after)
+    statement = statement.order_by(Todo.sno).limit(limit + 1)
+    if stream:
+        rows = db.session.execute(statement.execution_options(yield_per=current_app.config['TODO_STREAM_YIELD_PER']))
+    else:
+        rows = db.session.execute(statement).all()
+    return TodoPage(rows, limit, has_prev, has_next, after)
+
+@bp.route('/', methods=['GET', 'POST'])
 def ToDo():
     if request.method == 'POST':
         task = request.form['task']
         desc = request.form['desc']
-        newtask = Todo(task=task, description=desc)
-        db.session.add(newtask)
-        db.session.commit()
+        if current_app.config['TODO_GROUP_COMMIT']:
+            sno = current_group_writer().submit({'task': task, 'description': desc})
+        else:
+            sno = db.session.execute(
+                db.insert(Todo).values(task=task, description=desc).returning(Todo.sno)
+            ).scalar_one()
+            db.session.commit()
+        return created(sno, task, desc)
+
+    # Read the version before the rows, so a page is never cached (or
+    # tagged) under a version newer than the data it shows.
+    version = data_version()
+    etag = f"{templates_digest()}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    if current_app.config['TODO_STREAM_INDEX']:
+        response = Response(stream_with_context(render_index(stream=True)), mimetype='text/html')
+    elif current_app.config['TODO_PAGE_CACHE']:
+        page_cache = current_page_cache()
+        body = page_cache.get(version, request.full_path)
+        if body is None:
+            body = render_index().encode()
+            page_cache.put(version, request.full_path, body)
+        response = make_response(body)
+    else:
+        response = make_response(render_index())
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# Media type a scripted client can ask for to get just the new table row.
+ROW_FRAGMENT_MIMETYPE = 'text/html-fragment'
+
+def created(sno, task, desc):
+    """Respond to a create without reading or rendering the task list.
+
+    Browsers get a 303 back to the list (Post/Redirect/Get), so a refresh
+    never resubmits the form. Clients that ask for JSON or for the row
+    fragment get 201 with just the new task.
+    """
+    best = request.accept_mimetypes.best_match(['text/html', 'application/json', ROW_FRAGMENT_MIMETYPE])
+    if best == 'application/json':
+        response = jsonify(sno=sno, task=task, description=desc)
+    elif best == ROW_FRAGMENT_MIMETYPE:
+        todo_row = get_template_attribute('macros.html', 'todo_row')
+        todo = {'sno': sno, 'task': task, 'description': desc, 'done': False}
+        response = Response(todo_row(todo, open_total(), '/'), mimetype='text/html')
+    else:
+        return redirect('/', code=303)
+    response.status_code = 201
+    response.headers['Location'] = url_for('.update', sno=sno)
+    return response
+
+# Stand-ins for the parts of a row that differ per request: its position on
+# the page and the page its toggle form returns to. Task text is escaped, so
+# it can never contain a raw '<' and never these markers.
+ROW_INDEX, ROW_NEXT = Markup('<!--todo-index-->'), Markup('<!--todo-next-->')
+
+def row_parts(todo_row, todo):
+    """Render one row and split it around ROW_INDEX and ROW_NEXT."""
+    head, rest = str(todo_row(todo, ROW_INDEX, ROW_NEXT)).split(ROW_INDEX)
+    middle, tail = rest.split(ROW_NEXT)
+    return head, middle, tail
+
+@bp.app_template_global()
+def todo_rows(todos):
+    """Yield the table rows for ``todos`` as Markup, a batch at a time.
+
+    Rows come from row_cache when they are there, so a page costs about one
+    join per batch plus rendering the rows that changed. Batches are
+    TODO_ROW_BATCH_SIZE rows, small enough to keep streamed pages streaming.
+    """
+    use_cache = current_app.config['TODO_ROW_CACHE']
+    row_cache = current_row_cache()
+    batch_size = current_app.config['TODO_ROW_BATCH_SIZE']
+    next_page = str(escape(request.full_path if request.method == 'GET' else '/'))
+    todo_row = None
+    batch = []
+    for index, todo in enumerate(todos, 1):
+        # snos are never reused (see Todo), so a key always names the same row.
+        key = (todo.sno, todo.version)
+        parts = row_cache.get(key) if use_cache else None
+        if parts is None:
+            if todo_row is None:
+                todo_row = get_template_attribute('macros.html', 'todo_row')
+            parts = row_parts(todo_row, todo)
+            if use_cache:
+                row_cache.put(key, parts, sum(map(len, parts)))
+        batch += (parts[0], str(index), parts[1], next_page, parts[2])
+        if index % batch_size == 0:
+            yield Markup(''.join(batch))
+            batch = []
+    if batch:
+        yield Markup(''.join(batch))
 
-    allTodo = Todo.query.all()
-    return render_template('index.html', allTodo=allTodo)
+def render_index(stream=False):
+    limit = page_limit(stream)
+    # Open tasks by default; ?show=all includes the completed ones.
+    show = 'all' if request.args.get('show') == 'all' else None
+    allTodo = todo_page(
+        after=int_arg('after', maximum=SQLITE_MAX_INT - 1),  # an empty page links to before=after + 1
+        before=int_arg('before'),
+        limit=limit,
+        stream=stream,
+        open_only=show is None,
+    )
+    total = todo_total() if show else open_total()
+    if not stream:
+        return render_template('index.html', allTodo=allTodo, total=total, limit=limit, show=show)
+    # Same context as render_template, but rendered as a stream so the page
+    # head goes out before the rest of the rows have been fetched.
+    context = {'allTodo': allTodo, 'total': total, 'limit': limit, 'show': show}
+    current_app.update_template_context(context)
+    events = current_app.jinja_env.get_template('index.html').generate(context)
+    return chunked(events, current_app.config['TODO_STREAM_CHUNK_SIZE'])
 
-@app.route('/delete/<int:sno>')
+def chunked(events, min_size):
+    """Join template output into chunks of at least ``min_size`` characters.
+
+    Jinja's own buffering counts events, and one event may be a single
+    character or a whole batch of rows; counting characters keeps the
+    chunks an even size.
+    """
+    buffer, size = [], 0
+    for event in events:
+        buffer.append(event)
+        size += len(event)
+        if size >= min_size:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+@bp.route('/toggle/<int:sno>', methods=['POST'])
+def toggle(sno):
+    # The form posts the state it wants rather than "flip", so a double
+    # submit cannot undo itself.
+    done = request.form.get('done', '1') == '1'
+    completed_at = db.func.coalesce(Todo.completed_at, db.func.current_timestamp()) if done else None
+    toggled = db.session.execute(
+        db.update(Todo)
+        .where(Todo.sno == sno)
+        .values(done=done, completed_at=completed_at, version=Todo.version + 1)
+        .returning(Todo.sno)
+    ).scalar()
+    if toggled is None:
+        return abort(404)  # Return a 404 error if the task does not exist
+    db.session.commit()
+    return redirect(local_path(request.form.get('next', '/')))
+
+def local_path(target, default='/'):
+    """Return ``target`` if it is a path on this site, else ``default``.
+
+    Browsers read a backslash as a slash and drop tabs and newlines, so
+    "/\\evil.example" would leave the site just like "//evil.example".
+    """
+    parts = urlsplit(target)
+    if (
+        parts.scheme or parts.netloc or not parts.path.startswith('/') or target.startswith('//')
+        or '\\' in target or any(ord(char) < 0x20 or ord(char) == 0x7f for char in target)
+    ):
+        return default
+    return target
+
+@bp.route('/delete/<int:sno>')
 def delete(sno):
-    todo = Todo.query.filter_by(sno=sno).first()
-    if todo is None:
+    # One statement: no SELECT first, and the write transaction is as short as it can be.
+    deleted = db.session.execute(db.delete(Todo).where(Todo.sno == sno).returning(Todo.sno)).scalar()
+    if deleted is None:
         return abort(404)  # Return a 404 error if the task does not exist
-    db.session.delete(todo)
     db.session.commit()
     return redirect('/')
 
-@app.route('/update/<int:sno>', methods=['GET', 'POST'])
+def todo_for_update(sno):
+    return db.session.execute(
+        db.select(Todo.sno, Todo.task, Todo.description, Todo.version).where(Todo.sno == sno)
+    ).first()
+
+@bp.route('/update/<int:sno>', methods=['GET', 'POST'])
 def update(sno):
-    todo = Todo.query.filter_by(sno=sno).first()
-    if todo is None:
-        return abort(404)  # Return a 404 error if the task does not exist
     if request.method == 'POST':
         task = request.form['task']
         desc = request.form['desc']
-        todo.task = task
-        todo.description = desc
+        statement = db.update(Todo).where(Todo.sno == sno).values(task=task, description=desc, version=Todo.version + 1)
+        # The version the form was rendered from. Only write if nobody has
+        # saved since: nothing is locked while the user edits. Forms that do
+        # not send one keep last-writer-wins; one that is not a version is
+        # refused rather than skipping the check.
+        expected = request.form.get('version')
+        if expected is not None:
+            try:
+                expected = int(expected)
+            except ValueError:
+                abort(400, "version must be an integer")
+            if not 0 <= expected <= SQLITE_MAX_INT:
+                abort(400, "version is out of range")
+            statement = statement.where(Todo.version == expected)
+        updated = db.session.execute(statement.returning(Todo.sno)).scalar()
+        if updated is None:
+            current = todo_for_update(sno)
+            if current is None:
+                return abort(404)  # Return a 404 error if the task does not exist
+            conflict = render_template('conflict.html', todo=current, task=task, desc=desc)
+            return conflict, 409
         db.session.commit()
         return redirect('/')
-    return render_template('update.html', todo=todo)
+    todo = todo_for_update(sno)
+    if todo is None:
+        return abort(404)  # Return a 404 error if the task does not exist
+    etag = f"{templates_digest()}-{sno}-{todo.version}"
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    response = make_response(render_template('update.html', todo=todo))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# Control characters mark highlighted terms in FTS output; they are swapped
+# for <mark> tags only after the rest of the text has been HTML-escaped.
+MARK_START, MARK_END = '\x02', '\x03'
+SEARCH_SQL = db.text(
+    "SELECT todo_fts.rowid AS sno, "
+    "highlight(todo_fts, 0, char(2), char(3)) AS task, "
+    "snippet(todo_fts, 1, char(2), char(3), '…', 16) AS description, "
+    "todo.done AS done "
+    "FROM todo_fts JOIN todo ON todo.sno = todo_fts.rowid "
+    "WHERE todo_fts MATCH :query AND todo_fts.rowid >= ("
+    # FTS5 walks a term's matches in rowid order without scoring them, so
+    # finding the oldest of the newest :candidates is cheap; bm25 then only
+    # runs for the rows from there on, not for every match.
+    "SELECT min(rowid) FROM (SELECT rowid FROM todo_fts WHERE todo_fts MATCH :query "
+    "ORDER BY rowid DESC LIMIT :candidates)) "
+    "ORDER BY rank LIMIT :limit OFFSET :offset"
+)
 
-@app.errorhandler(404)
+def fts_query(text):
+    # Quote every term so user input can never be parsed as FTS5 syntax.
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    return ' '.join(terms)
+
+def highlighted(text):
+    return Markup(str(escape(text)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+@bp.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    limit = page_limit()
+    page = int_arg('page', minimum=1, maximum=SQLITE_MAX_INT // limit) or 1  # the offset must fit too
+    results, has_next = [], False
+    if q:
+        rows = db.session.execute(
+            SEARCH_SQL, {
+                'query': fts_query(q),
+                'candidates': current_app.config['TODO_SEARCH_CANDIDATES'],
+                'limit': limit + 1,
+                'offset': (page - 1) * limit,
+            }
+        ).all()
+        has_next = len(rows) > limit
+        results = [(row.sno, highlighted(row.task), highlighted(row.description), row.done) for row in rows[:limit]]
+    return render_template('search.html', q=q, results=results, page=page, limit=limit, has_next=has_next)
+
+@bp.cli.command('init-db')
+def init_db():
+    """Create the schema, or bring an existing database up to date."""
+    start = time.perf_counter()
+    init_schema()
+    print(f"Schema ready for {todo_total()} tasks in {time.perf_counter() - start:.2f}s")
+
+@bp.cli.command('rebuild-search')
+def rebuild_search():
+    """Rebuild the full-text search index from the todo table."""
+    ensure_schema()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO todo_fts (todo_fts) VALUES ('rebuild')")
+        conn.exec_driver_sql("INSERT INTO todo_fts (todo_fts) VALUES ('optimize')")
+    print(f"Search index rebuilt for {todo_total()} tasks")
+
+@bp.cli.command('seed')
+@click.option('--rows', default=100000, show_default=True, help="Number of todos to insert.")
+@click.option('--chunk-size', default=50000, show_default=True, help="Rows per executemany call.")
+@click.option('--transaction-rows', default=500000, show_default=True, help="Rows per committed transaction.")
+@click.option('--random-seed', type=int, default=None, help="Seed for reproducible datasets.")
+def seed_command(rows, chunk_size, transaction_rows, random_seed):
+    """Insert generated todos with realistic task and description lengths."""
+    def progress(done, elapsed):
+        print(f"  {done} rows, {done / elapsed:.0f} rows/s")
+
+    ensure_schema()
+    raw = db.engine.raw_connection()
+    try:
+        elapsed = seed_todos(raw.driver_connection, rows, chunk_size, transaction_rows,
+                             rng=random.Random(random_seed), progress=progress)
+    finally:
+        raw.close()
+    print(f"Inserted {rows} todos in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+
+@bp.route('/api/todos/bulk', methods=['POST'])
+def bulk_todos():
+    # Accepts NDJSON or a JSON array of {"op": "create"|"update"|"delete", ...}
+    # objects and streams back one NDJSON result line per operation.
+    body = spool(request.stream)
+    if request.mimetype == 'application/x-ndjson':
+        operations = iter_ndjson(body)
+    else:
+        operations = iter_json_array(body)
+    results = apply_bulk(db.engine, Todo.__table__, operations, current_app.config['TODO_BULK_CHUNK_SIZE'])
+    response = Response(stream_with_context(results), mimetype='application/x-ndjson')
+    response.call_on_close(body.close)
+    return response
+
+@bp.app_template_global()
+def asset_url(filename):
+    """URL of a file under static/: its fingerprinted copy once built."""
+    entry = asset_manifest(assets_dir()).get(filename)
+    if entry is not None:
+        return url_for('todo.asset', filename=entry['path'])
+    if filename in VENDORED and not os.path.exists(os.path.join(current_app.static_folder, filename)):
+        return VENDORED[filename][0]  # not vendored yet
+    return url_for('static', filename=filename)
+
+@bp.app_template_global()
+def asset_integrity(filename):
+    entry = asset_manifest(assets_dir()).get(filename)
+    if entry is not None:
+        return entry['integrity']
+    return VENDORED[filename][1] if filename in VENDORED else ''
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    # The name carries a hash of the content, so the file behind a URL
+    # never changes and browsers need not even revalidate it.
+    max_age = current_app.config['TODO_ASSETS_MAX_AGE']
+    gzipped = safe_join(assets_dir(), filename + '.gz')
+    if request.accept_encodings['gzip'] and gzipped and os.path.isfile(gzipped):
+        # Compressed once at build time; send_file sets Content-Encoding.
+        response = send_from_directory(assets_dir(), filename + '.gz', max_age=max_age)
+        current_metrics().inc('todo_precompressed_responses_total', {})
+    else:
+        response = send_from_directory(assets_dir(), filename, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.cli.command('vendor-assets')
+@click.option('--from', 'source', type=click.Path(exists=True, file_okay=False),
+              help="Copy the files from this directory instead of downloading them.")
+def vendor_assets(source):
+    """Fetch the pinned third-party files into static/vendor/."""
+    try:
+        fetched = vendor(current_app.static_folder, source)
+    except (OSError, ValueError) as exc:
+        raise click.ClickException(str(exc))
+    for name in fetched:
+        print(f"Vendored {name}")
+
+@bp.cli.command('build-assets')
+def build_assets():
+    """Copy static/ to content-hashed names, with .gz variants."""
+    manifest = build(current_app.static_folder, assets_dir())
+    print(f"Built {len(manifest)} assets into {assets_dir()}")
+
+@bp.cli.command('precompile-templates')
+def precompile_templates():
+    """Compile every template into the on-disk template cache."""
+    cache = current_app.jinja_env.bytecode_cache
+    if cache is None:
+        raise click.ClickException("The template cache is off; set TODO_TEMPLATE_CACHE to use it.")
+    try:
+        os.makedirs(cache.directory, exist_ok=True)
+    except OSError as e:
+        raise click.ClickException(str(e))
+    if not os.access(cache.directory, os.W_OK):
+        raise click.ClickException(f"{cache.directory} is not writable")
+    names = current_app.jinja_env.list_templates()
+    for name in names:
+        # Loading a template compiles it and writes it to the cache, unless
+        # the cache already holds it for the current source.
+        current_app.jinja_env.get_template(name)
+    print(f"Compiled {len(names)} templates into {cache.directory}")
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    return Response(current_metrics().render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/ready')
+def ready():
+    # For load balancer readiness checks: with TODO_WARM_UP on, this
+    # process only reports ready once warm_up() has run.
+    seconds = current_app.extensions.get('todo_warm_up_seconds')
+    ready = seconds is not None or not current_app.config['TODO_WARM_UP']
+    response = jsonify(ready=ready, warm_up_seconds=seconds)
+    response.status_code = 200 if ready else 503
+    response.cache_control.no_store = True
+    return response
+
+@bp.route('/admin/sqlite')
+def sqlite_settings():
+    conn = db.session.connection()
+    active = {pragma: conn.exec_driver_sql(f"PRAGMA {pragma}").scalar() for pragma in SQLITE_PRAGMAS}
+    configured = {pragma: current_app.config.get(f"SQLITE_{pragma.upper()}") for pragma in SQLITE_PRAGMAS}
+    return jsonify(active=active, configured=configured)
+
+@bp.route('/admin/group-commit')
+def group_commit_stats():
+    return jsonify(enabled=current_app.config['TODO_GROUP_COMMIT'], **current_group_writer().stats())
+
+@bp.route('/admin/compression')
+def compression_stats():
+    compressor = current_app.extensions.get('todo_compression')
+    return jsonify(enabled=compressor is not None, **(compressor.stats() if compressor else {}))
+
+@bp.route('/admin/page-cache')
+def page_cache_stats():
+    return jsonify(enabled=current_app.config['TODO_PAGE_CACHE'], **current_page_cache().stats())
+
+@bp.route('/admin/row-cache')
+def row_cache_stats():
+    return jsonify(enabled=current_app.config['TODO_ROW_CACHE'], **current_row_cache().stats())
+
+@bp.app_errorhandler(404)
 def not_found(e):
     return render_template('404.html'), 404  # Create a 404.html template
 
+def create_app(profile=None, config=None):
+    """Build the app for a config profile, see CONFIG_PROFILES.
+
+    Settings are layered: DEFAULT_CONFIG, the profile, FLASK_ prefixed
+    environment variables (e.g. FLASK_SQLITE_BUSY_TIMEOUT=10000), then
+    ``config``. Nothing here touches the database.
+    """
+    profile = profile or os.environ.get('FLASK_TODO_PROFILE', 'development')
+    if profile not in CONFIG_PROFILES:
+        raise ValueError(f"Unknown config profile {profile!r}; expected one of {', '.join(CONFIG_PROFILES)}")
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(CONFIG_PROFILES[profile])
+    app.config.from_prefixed_env()
+    app.config.update(config or {})
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine  # created by init_app, but not connected yet
+    event.listen(engine, 'connect', functools.partial(apply_sqlite_pragmas, app.config))
+    if app.config['TODO_SQL_TIMING']:
+        event.listen(engine, 'before_cursor_execute', start_query_timer)
+        event.listen(engine, 'after_cursor_execute', functools.partial(record_query, app.config['TODO_SLOW_QUERY_SECONDS']))
+        event.listen(engine, 'handle_error', discard_query_timer)
+    if app.config['TODO_SLOW_QUERY_LOG']:
+        add_slow_query_log(app.config['TODO_SLOW_QUERY_LOG'])
+    init_helpers(app, engine)
+
+    if app.config['TODO_TEMPLATE_CACHE']:
+        app.jinja_env.bytecode_cache = TemplateBytecodeCache(template_cache_dir(app))
+
+    if app.config['TODO_COMPRESSION']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config['TODO_COMPRESSION_MIN_SIZE'],
+            level=app.config['TODO_COMPRESSION_LEVEL'],
+            on_compress=functools.partial(record_compression, app.extensions['todo_metrics']),
+        )
+        app.extensions['todo_compression'] = app.wsgi_app
+
+    app.register_blueprint(bp)
+    return app
+
+def __getattr__(name):
+    # `app:app` (gunicorn, flask --app app) builds the default app on first
+    # use instead of at import, so `import app` itself stays cheap.
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
-    app.run(debug=True, port=8000)
+    create_app().run(debug=True, port=8000)
@@ -0,0 +1,96 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import urllib.request
+
+# Third-party files served from static/vendor/. The integrity hashes pin the
+# exact release: vendoring refuses anything else, and until a file has been
+# vendored pages fall back to loading it from its CDN url.
+VENDORED = {
+    'vendor/bootstrap.min.css': (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+        "sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH",
+    ),
+    'vendor/bootstrap.bundle.min.js': (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+        "sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz",
+    ),
+}
+
+MANIFEST = 'manifest.json'
+# Only text formats shrink enough to be worth a .gz variant.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+
+def integrity(data):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def vendor(static_dir, source=None):
+    """Fetch the VENDORED files into ``static_dir`` and check their hashes.
+
+    Files are downloaded, or copied from the ``source`` directory (looked up
+    by base name) where there is no network access.
+    """
+    fetched = []
+    for name, (url, expected) in VENDORED.items():
+        if source:
+            with open(os.path.join(source, os.path.basename(name)), 'rb') as f:
+                data = f.read()
+        else:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        if integrity(data) != expected:
+            raise ValueError(f"{name} does not match its pinned integrity hash {expected}")
+        path = os.path.join(static_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        fetched.append(name)
+    return fetched
+
+
+def build(static_dir, out_dir):
+    """Copy every file under ``static_dir`` to a content-hashed name in ``out_dir``.
+
+    Text files also get a .gz sibling, compressed once here rather than per
+    request. Files from earlier builds are left in place, so pages rendered
+    before a deploy keep working. Returns the manifest, which maps each
+    source name to its hashed name and integrity hash.
+    """
+    manifest = {}
+    for root, _, files in os.walk(static_dir):
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(name)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            target = os.path.join(out_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            if ext in COMPRESSIBLE:
+                # mtime=0 keeps the output identical from build to build.
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    with open(target + '.gz', 'wb') as f:
+                        f.write(compressed)
+            manifest[name] = {'path': hashed, 'integrity': integrity(data)}
+    path = os.path.join(out_dir, MANIFEST)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
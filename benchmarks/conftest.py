@@ -0,0 +1,136 @@
+"""Fixtures and options for the database micro-benchmarks.
+
+    pytest benchmarks --bench-sizes 1000,100000,1000000 --bench-save-baseline
+    pytest benchmarks --bench-sizes 1000,100000,1000000
+
+The first run records benchmarks/baseline.json; later runs fail any
+benchmark whose throughput drops more than --bench-threshold below it.
+Every run writes its numbers to benchmarks/results.json.
+"""
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TMP = tempfile.mkdtemp(prefix='todo-bench-')
+TEMPLATE = os.path.join(TMP, 'template.db')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('todo benchmarks')
+    group.addoption('--bench-sizes', default='1000', help="comma-separated table sizes (default: 1000)")
+    group.addoption('--bench-threshold', type=float, default=0.25,
+                    help="fail when throughput is this fraction below the baseline (default: 0.25)")
+    group.addoption('--bench-baseline', default=os.path.join(HERE, 'baseline.json'))
+    group.addoption('--bench-results', default=os.path.join(HERE, 'results.json'))
+    group.addoption('--bench-save-baseline', action='store_true', help="record this run as the new baseline")
+
+
+def pytest_generate_tests(metafunc):
+    if 'rows' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('--bench-sizes').split(',')]
+        metafunc.parametrize('rows', sizes, ids=[f"{size}rows" for size in sizes], scope='session')
+
+
+def seed(path, rows, chunk=10000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        for start in range(0, rows, chunk):
+            conn.executemany(
+                "INSERT INTO todo (task, description) VALUES (?, ?)",
+                ((f"Task {i}", f"Description for task number {i}") for i in range(start, min(start + chunk, rows))),
+            )
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+@pytest.fixture(scope='session')
+def bench_app():
+    """The app in its testing profile, with the schema created in TEMPLATE."""
+    from app import create_app, db, init_schema
+
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{TEMPLATE}"})
+    with app.app_context():
+        init_schema()
+        db.engine.dispose()
+    return app
+
+
+@pytest.fixture(scope='session')
+def seeded_file(bench_app, rows):
+    """A database file holding ``rows`` todos, built once per size."""
+    path = os.path.join(TMP, f"seeded-{rows}.db")
+    with sqlite3.connect(TEMPLATE) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    shutil.copyfile(TEMPLATE, path)
+    seed(path, rows)
+    return path
+
+
+@pytest.fixture
+def session(bench_app, seeded_file, tmp_path):
+    """A Session bound to a private copy of the seeded file."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import Session
+    from app import apply_sqlite_pragmas
+
+    path = tmp_path / 'bench.db'
+    shutil.copyfile(seeded_file, path)
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, 'connect', functools.partial(apply_sqlite_pragmas, bench_app.config))
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+class Recorder:
+    def __init__(self, config):
+        self.config = config
+        self.results = {}
+        self.baseline = {}
+        path = config.getoption('--bench-baseline')
+        if os.path.exists(path) and not config.getoption('--bench-save-baseline'):
+            with open(path) as f:
+                self.baseline = json.load(f)['results']
+
+    def record(self, name, rows, ops, seconds):
+        key = f"{name}[{rows}]"
+        ops_per_sec = ops / seconds
+        self.results[key] = {'ops': ops, 'seconds': round(seconds, 6), 'ops_per_sec': round(ops_per_sec, 1)}
+        base = self.baseline.get(key)
+        if base is not None:
+            floor = base['ops_per_sec'] * (1 - self.config.getoption('--bench-threshold'))
+            assert ops_per_sec >= floor, (
+                f"{key}: {ops_per_sec:.1f} ops/s is more than "
+                f"{self.config.getoption('--bench-threshold'):.0%} below the baseline {base['ops_per_sec']:.1f} ops/s"
+            )
+
+    def write(self):
+        if not self.results:
+            return
+        data = {'results': dict(sorted(self.results.items()))}
+        with open(self.config.getoption('--bench-results'), 'w') as f:
+            json.dump(data, f, indent=2)
+        if self.config.getoption('--bench-save-baseline'):
+            with open(self.config.getoption('--bench-baseline'), 'w') as f:
+                json.dump(data, f, indent=2)
+
+
+def pytest_configure(config):
+    config._todo_bench = Recorder(config)
+
+
+def pytest_sessionfinish(session):
+    session.config._todo_bench.write()
+    shutil.rmtree(TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def recorder(request):
+    return request.config._todo_bench
@@ -0,0 +1,258 @@
+"""Load-test the ToDo routes and report throughput and latency as JSON.
+
+Starts the app on a throwaway database (under gunicorn or in-process),
+seeds it through the bulk API, then runs a weighted mix of GET /, POST /,
+POST /update/<sno> and GET /delete/<sno> from concurrent clients:
+
+    python -m benchmarks.loadtest --server gunicorn --workers 4 --seed 10000 \\
+        --concurrency 32 --duration 30 --mix get=70,create=10,update=15,delete=5
+
+Pass --url to load an already running server instead.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ('get', 'create', 'update', 'delete')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/?limit=1')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not come up within {timeout}s")
+
+
+def start_gunicorn(port, workers, env):
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop():
+        process.terminate()
+        process.wait(timeout=30)
+    return stop
+
+
+def start_in_process(port):
+    from werkzeug.serving import make_server
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def seed(host, port, rows, chunk=10000):
+    """Create ``rows`` tasks through the bulk API and return their snos."""
+    snos = []
+    conn = http.client.HTTPConnection(host, port, timeout=300)
+    for start in range(0, rows, chunk):
+        body = '\n'.join(
+            json.dumps({'op': 'create', 'task': f"Seeded task {i}", 'description': f"Seeded description {i}"})
+            for i in range(start, min(start + chunk, rows))
+        )
+        conn.request('POST', '/api/todos/bulk', body, {'Content-Type': 'application/x-ndjson'})
+        for line in conn.getresponse().read().decode().splitlines():
+            result = json.loads(line)
+            if 'sno' in result:
+                snos.append(result['sno'])
+    conn.close()
+    return snos
+
+
+class Pool:
+    """Thread-safe set of snos known to exist, for updates and deletes."""
+
+    def __init__(self, snos):
+        self._snos = list(snos)
+        self._lock = threading.Lock()
+
+    def add(self, sno):
+        with self._lock:
+            self._snos.append(sno)
+
+    def pick(self, remove=False):
+        with self._lock:
+            if not self._snos:
+                return None
+            index = random.randrange(len(self._snos))
+            if not remove:
+                return self._snos[index]
+            # Swap-remove keeps this O(1).
+            self._snos[index], self._snos[-1] = self._snos[-1], self._snos[index]
+            return self._snos.pop()
+
+
+def run_request(conn, op, pool, counter):
+    form = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if op == 'get':
+        conn.request('GET', '/')
+        expected = (200,)
+    elif op == 'create':
+        body = urllib.parse.urlencode({'task': f"Load task {next(counter)}", 'desc': "Created by the load test"})
+        conn.request('POST', '/', body, {**form, 'Accept': 'application/json'})
+        expected = (201,)
+    else:
+        sno = pool.pick(remove=op == 'delete')
+        if sno is None:
+            return None, None
+        if op == 'update':
+            body = urllib.parse.urlencode({'task': f"Updated task {sno}", 'desc': "Updated by the load test"})
+            conn.request('POST', f'/update/{sno}', body, form)
+        else:
+            conn.request('GET', f'/delete/{sno}')
+        expected = (302, 303)
+    response = conn.getresponse()
+    data = response.read()
+    if op == 'create' and response.status == 201:
+        pool.add(json.loads(data)['sno'])
+    return response.status, response.status in expected
+
+
+def client(host, port, ops, weights, pool, deadline, results, counter):
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    while time.monotonic() < deadline:
+        op = random.choices(ops, weights)[0]
+        start = time.perf_counter()
+        try:
+            status, ok = run_request(conn, op, pool, counter)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            status, ok = 'exception', False
+        if status is None:
+            continue
+        results[op].append((time.perf_counter() - start, status, ok))
+    conn.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, _, ok in samples if not ok)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 2),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'statuses': statuses,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=('gunicorn', 'inprocess'), default='gunicorn')
+    parser.add_argument('--url', help="load an already running server instead of starting one")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument('--seed', type=int, default=1000, help="tasks to create before the run")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('get=70,create=10,update=15,delete=5'))
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    stop = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            parsed = urllib.parse.urlsplit(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+        else:
+            host, port = '127.0.0.1', free_port()
+            env = {**os.environ, 'FLASK_SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'load.db')}"}
+            if args.server == 'gunicorn':
+                stop = start_gunicorn(port, args.workers, env)
+            else:
+                os.environ.update(env)
+                stop = start_in_process(port)
+        try:
+            wait_until_up(host, port)
+            pool = Pool(seed(host, port, args.seed) if args.seed else [])
+            ops = list(args.mix)
+            weights = [args.mix[op] for op in ops]
+            results = {op: [] for op in ops}
+            counter = iter(range(sys.maxsize))
+            start = time.monotonic()
+            threads = [
+                threading.Thread(target=client, args=(host, port, ops, weights, pool, start + args.duration, results, counter))
+                for _ in range(args.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - start
+        finally:
+            if stop is not None:
+                stop()
+
+    report = {
+        'config': {
+            'server': 'external' if args.url else args.server,
+            'workers': args.workers if args.server == 'gunicorn' and not args.url else None,
+            'seed': args.seed,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'mix': args.mix,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'total': summarize([sample for samples in results.values() for sample in samples], elapsed),
+        'operations': {op: summarize(samples, elapsed) for op, samples in results.items()},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Measure the memory of each gunicorn worker after warm-up (Linux only).
+
+Starts gunicorn on a throwaway database of --rows generated tasks, sends
+--requests page views so every worker has served some, then reads
+/proc/<pid>/smaps_rollup for each worker:
+
+    python -m benchmarks.memory --workers 4                    # gunicorn.conf.py
+    python -m benchmarks.memory --workers 4 --config /dev/null  # plain gunicorn
+
+RSS counts pages shared with the master and the other workers; USS is
+what the worker alone holds, i.e. what each extra worker costs.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest import ROOT, free_port, wait_until_up
+
+
+def worker_pids(master):
+    with open(f'/proc/{master}/task/{master}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return {
+        'rss_kb': fields['Rss'],
+        'pss_kb': fields['Pss'],
+        'uss_kb': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', default=os.path.join(ROOT, 'gunicorn.conf.py'))
+    parser.add_argument('--app', default='app:app', help="WSGI app; the config's wsgi_app is not used")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=400)
+    args = parser.parse_args()
+
+    flask = [sys.executable, '-m', 'flask', '--app', 'app']
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = {**os.environ, 'FLASK_SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'memory.db')}"}
+        subprocess.run(flask + ['init-db'], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(flask + ['seed', '--rows', str(args.rows), '--random-seed', '1'],
+                       cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        command = [sys.executable, '-m', 'gunicorn', '-c', args.config, '-w', str(args.workers),
+                   '-b', f'127.0.0.1:{port}', args.app]
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up('127.0.0.1', port)
+            for i in range(args.requests):
+                # A fresh connection per request spreads them over the workers.
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.request('GET', f'/?limit=50&after={i * 50 % max(args.rows, 1)}')
+                conn.getresponse().read()
+                conn.close()
+            time.sleep(1)
+            workers = [memory(pid) for pid in worker_pids(process.pid)]
+            master = memory(process.pid)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    mean = lambda key: round(sum(worker[key] for worker in workers) / len(workers))
+    report = {
+        'config': {'config': args.config, 'app': args.app, 'workers': args.workers,
+                   'rows': args.rows, 'requests': args.requests},
+        'master': master,
+        'per_worker_mean': {key: mean(key) for key in ('rss_kb', 'pss_kb', 'uss_kb')},
+        'workers': workers,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compare the ORM and column-projected read paths of the task list.
+
+Loads every row of a throwaway database both ways and reports CPU time and
+peak traced memory per row:
+
+    python -m benchmarks.read_path --rows 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+
+def seed(path, rows, chunk=10000):
+    conn = sqlite3.connect(path)
+    have = conn.execute("SELECT COUNT(*) FROM todo").fetchone()[0]
+    with conn:
+        for start in range(have, rows, chunk):
+            conn.executemany(
+                "INSERT INTO todo (task, description) VALUES (?, ?)",
+                ((f"Task {i}", f"Description for task number {i}") for i in range(start, min(start + chunk, rows))),
+            )
+    conn.close()
+
+
+def measure(load):
+    gc.collect()
+    start = time.process_time()
+    count = len(load())
+    cpu = time.process_time() - start
+    gc.collect()
+    tracemalloc.start()
+    rows = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del rows
+    return count, cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        from app import create_app, db, init_schema, Todo, LIST_COLUMNS
+        app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}"})
+        with app.app_context():
+            init_schema()
+
+        paths = {
+            'orm': lambda: Todo.query.order_by(Todo.sno).all(),
+            'core': lambda: db.session.execute(db.select(*LIST_COLUMNS).order_by(Todo.sno)).all(),
+        }
+        print(f"{'rows':>9} {'path':>5} {'cpu us/row':>11} {'bytes/row':>10}")
+        for rows in sorted(args.rows):
+            seed(path, rows)
+            for name, load in paths.items():
+                with app.app_context():
+                    count, cpu, peak = measure(load)
+                    db.session.remove()
+                print(f"{count:>9} {name:>5} {cpu / count * 1e6:>11.2f} {peak / count:>10.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Measure how long the app takes to start, in fresh interpreters.
+
+Each phase runs in a new process, --repeat times, against a database of
+--rows generated tasks (or an existing --database):
+
+    python -m benchmarks.startup --rows 1000000 --profile production
+
+import         python -c "import app"
+first_request  import, build the app and serve GET /?limit=1 in-process
+cli            flask routes
+gunicorn       gunicorn with one worker, from launch to the first response
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest import ROOT, free_port, wait_until_up
+
+FIRST_REQUEST = (
+    "import app; "
+    "response = app.app.test_client().get('/?limit=1'); "
+    "assert response.status_code == 200, response.status_code"
+)
+
+
+def timed_run(command, env):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def timed_gunicorn(env):
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f'127.0.0.1:{port}', 'app:app']
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up('127.0.0.1', port)
+        return time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(samples):
+    return {
+        'min_ms': round(min(samples) * 1000, 1),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help="tasks to generate into a throwaway database")
+    parser.add_argument('--database', help="use this existing database file instead")
+    parser.add_argument('--profile', default='production', help="config profile the app is built with")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    flask = [sys.executable, '-m', 'flask', '--app', 'app']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.database or os.path.join(tmp, 'startup.db')
+        env = {
+            **os.environ,
+            'FLASK_SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.abspath(path)}",
+            'FLASK_TODO_PROFILE': args.profile,
+        }
+        if not args.database:
+            subprocess.run(flask + ['init-db'], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+            subprocess.run(flask + ['seed', '--rows', str(args.rows), '--random-seed', '1'],
+                           cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        phases = {
+            'import': lambda: timed_run([sys.executable, '-c', 'import app'], env),
+            'first_request': lambda: timed_run([sys.executable, '-c', FIRST_REQUEST], env),
+            'cli': lambda: timed_run(flask + ['routes'], env),
+            'gunicorn': lambda: timed_gunicorn(env),
+        }
+        samples = {name: [] for name in phases}
+        # Interleave the phases so a slow patch of the machine hits all of them.
+        for _ in range(args.repeat):
+            for name, phase in phases.items():
+                samples[name].append(phase())
+
+    report = {
+        'config': {'rows': None if args.database else args.rows, 'profile': args.profile, 'repeat': args.repeat},
+        'phases': {name: summarize(values) for name, values in samples.items()},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
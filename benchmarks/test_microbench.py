@@ -0,0 +1,95 @@
+"""Micro-benchmarks for the data layer, run against the Todo model.
+
+Each benchmark runs ROUNDS times and keeps the fastest round, which is far
+less noisy than a single run or the mean.
+"""
+import random
+import time
+
+from sqlalchemy import delete, insert, select, update
+
+from app import Todo
+
+OPS = 500
+PAGE_SIZE = 50
+PAGES = 100
+ROUNDS = 3
+
+
+def timed(fn):
+    best = None
+    for round_number in range(ROUNDS):
+        start = time.perf_counter()
+        fn(round_number)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_insert_single(session, rows, recorder):
+    def run(round_number):
+        for i in range(OPS):
+            session.add(Todo(task=f"Bench task {i}", description="One commit per row"))
+            session.commit()
+    recorder.record('insert_single', rows, OPS, timed(run))
+
+
+def test_insert_batched(session, rows, recorder):
+    values = [{'task': f"Bench task {i}", 'description': "One commit for the batch"} for i in range(OPS * 10)]
+
+    def run(round_number):
+        session.execute(insert(Todo), values)
+        session.commit()
+    recorder.record('insert_batched', rows, len(values), timed(run))
+
+
+def test_pk_lookup(session, rows, recorder):
+    snos = [random.randint(1, rows) for _ in range(OPS * 10)]
+
+    def run(round_number):
+        for sno in snos:
+            assert session.get(Todo, sno, populate_existing=True) is not None
+    recorder.record('pk_lookup', rows, len(snos), timed(run))
+
+
+def test_full_scan(session, rows, recorder):
+    def run(round_number):
+        assert len(session.scalars(select(Todo)).all()) == rows
+        session.expunge_all()
+    recorder.record('full_scan', rows, rows, timed(run))
+
+
+def test_paginated_scan(session, rows, recorder):
+    pages = min(PAGES, rows // PAGE_SIZE)
+
+    def run(round_number):
+        after = 0
+        for _ in range(pages):
+            page = session.execute(
+                select(Todo.sno, Todo.task, Todo.description).where(Todo.sno > after).order_by(Todo.sno).limit(PAGE_SIZE)
+            ).all()
+            after = page[-1].sno
+    recorder.record('paginated_scan', rows, pages, timed(run))
+
+
+def test_update(session, rows, recorder):
+    snos = random.sample(range(1, rows + 1), min(OPS, rows))
+
+    def run(round_number):
+        for sno in snos:
+            session.execute(
+                update(Todo).where(Todo.sno == sno).values(task="Updated", version=Todo.version + 1)
+            )
+            session.commit()
+    recorder.record('update', rows, len(snos), timed(run))
+
+
+def test_delete(session, rows, recorder):
+    per_round = min(OPS, rows // ROUNDS)
+    snos = random.sample(range(1, rows + 1), per_round * ROUNDS)
+
+    def run(round_number):
+        for sno in snos[round_number * per_round:(round_number + 1) * per_round]:
+            session.execute(delete(Todo).where(Todo.sno == sno))
+            session.commit()
+    recorder.record('delete', rows, per_round, timed(run))
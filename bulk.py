@@ -0,0 +1,251 @@
+import codecs
+import json
+import shutil
+import tempfile
+from itertools import groupby, islice
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+FIELDS = ('task', 'description')
+OPERATIONS = ('create', 'update', 'delete')
+# Request bodies and results up to this size are spooled in memory, larger
+# ones in a temporary file.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def spool(stream):
+    """Read ``stream`` to the end into a temporary file, rewound for reading.
+
+    Reading the request body first means a slow upload is over before the
+    write transaction starts, rather than holding its lock meanwhile.
+    """
+    spooled = tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE)
+    shutil.copyfileobj(stream, spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def iter_ndjson(stream):
+    """Yield one decoded value per line, or a ValueError for a bad line."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+def _may_continue(value, buffer, end):
+    # Only a number can decode from a prefix of itself. It is complete once
+    # something other than number characters follows it in the buffer.
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    while end < len(buffer) and buffer[end] in NUMBER_CHARS:
+        end += 1
+    return end == len(buffer)
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """Yield the elements of a top-level JSON array without reading it all.
+
+    The stream is read ``chunk_size`` bytes at a time and each element is
+    decoded as soon as it is complete, so memory stays bounded by the size
+    of the largest single element.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, eof = '', 0, False
+    expect = '['
+
+    def fill():
+        nonlocal buffer, pos, eof
+        data = stream.read(chunk_size)
+        eof = not data
+        buffer = buffer[pos:] + text.decode(data, final=eof)
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+        char = buffer[pos]
+        if expect == '[':
+            if char != '[':
+                raise ValueError("Expected a JSON array")
+            pos += 1
+            expect = 'first'
+        elif expect in ('first', 'value'):
+            if char == ']' and expect == 'first':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if not eof and _may_continue(value, buffer, end):
+                # The chunk ended inside a number ("2." of "2.5"): read on.
+                fill()
+                continue
+            pos = end
+            expect = 'separator'
+            yield value
+        else:
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' at offset {pos}")
+            pos += 1
+            expect = 'value'
+
+
+def parse_operation(item):
+    """Return (op, params) for one bulk item or raise ValueError."""
+    if isinstance(item, Exception):
+        raise ValueError(f"Invalid JSON: {item}")
+    if not isinstance(item, dict):
+        raise ValueError("Each operation must be a JSON object")
+    op = item.get('op')
+    if op not in OPERATIONS:
+        raise ValueError(f"'op' must be one of {', '.join(OPERATIONS)}")
+    params = {}
+    if op != 'create':
+        sno = item.get('sno')
+        if not isinstance(sno, int) or isinstance(sno, bool):
+            raise ValueError("'sno' must be an integer")
+        params['b_sno'] = sno
+    if op == 'update' and item.get('version') is not None:
+        # Optional: only update if the row is still at this version.
+        version = item['version']
+        if not isinstance(version, int) or isinstance(version, bool):
+            raise ValueError("'version' must be an integer")
+        params['b_version'] = version
+    if op != 'delete':
+        for field in FIELDS:
+            if not isinstance(item.get(field), str):
+                raise ValueError(f"'{field}' must be a string")
+            params[field] = item[field]
+    return op, params
+
+
+def apply_run(conn, table, op, items):
+    """Apply a run of same-type operations with one executemany-style statement.
+
+    ``items`` is a list of (index, params) pairs; a result dict is returned
+    for each of them, in order.
+    """
+    pk = list(table.primary_key)[0]
+    if op == 'create':
+        statement = insert(table).returning(pk, sort_by_parameter_order=True)
+        keys = conn.execute(statement, [params for _, params in items]).scalars().all()
+        return [{'index': index, 'op': op, 'status': 'ok', 'sno': key} for (index, _), key in zip(items, keys)]
+
+    snos = [params['b_sno'] for _, params in items]
+    if op == 'update':
+        return update_run(conn, table, pk, items, snos)
+    found = set(conn.execute(delete(table).where(pk.in_(snos)).returning(pk)).scalars())
+
+    results = []
+    for index, params in items:
+        sno = params['b_sno']
+        status = 'ok' if sno in found else 'not_found'
+        # A row can only be deleted once, even if it appears twice in the run.
+        found.discard(sno)
+        results.append({'index': index, 'op': op, 'status': status, 'sno': sno})
+    return results
+
+
+def update_run(conn, table, pk, items, snos):
+    # Conflicts are decided against the versions read here. Every UPDATE is
+    # also conditional on the version it expects, so a write that lands in
+    # between makes the row count come up short and the bulk transaction
+    # is rolled back rather than overwriting it.
+    versions = dict(conn.execute(select(pk, table.c.version).where(pk.in_(snos))).all())
+    rows, results = [], []
+    for index, params in items:
+        sno = params['b_sno']
+        result = {'index': index, 'op': 'update', 'sno': sno}
+        if sno not in versions:
+            result['status'] = 'not_found'
+        elif params.get('b_version', versions[sno]) != versions[sno]:
+            result.update(status='conflict', version=versions[sno])
+        else:
+            rows.append({'b_sno': sno, 'b_version': versions[sno], **{field: params[field] for field in FIELDS}})
+            versions[sno] += 1
+            result.update(status='ok', version=versions[sno])
+        results.append(result)
+    if rows:
+        statement = (
+            update(table)
+            .where(pk == bindparam('b_sno'), table.c.version == bindparam('b_version'))
+            .values({field: bindparam(field) for field in FIELDS})
+            .values(version=table.c.version + 1)
+        )
+        if conn.execute(statement, rows).rowcount != len(rows):
+            raise RuntimeError("Tasks were changed by another request during the bulk update")
+    return results
+
+
+def apply_chunk(conn, table, chunk):
+    results = []
+    valid = []
+    for index, item in chunk:
+        try:
+            op, params = parse_operation(item)
+        except ValueError as exc:
+            results.append({'index': index, 'status': 'error', 'error': str(exc)})
+        else:
+            valid.append((op, index, params))
+    for op, run in groupby(valid, key=lambda entry: entry[0]):
+        results.extend(apply_run(conn, table, op, [(index, params) for _, index, params in run]))
+    results.sort(key=lambda result: result['index'])
+    return results
+
+
+def apply_bulk(engine, table, operations, chunk_size=1000):
+    """Apply ``operations`` in a single transaction, yielding NDJSON results.
+
+    Operations are consumed ``chunk_size`` at a time, so neither the request
+    body nor the result list is ever held in memory in full. Results are
+    spooled until the transaction has ended and only sent after that: SQLite
+    has one write lock, and a client reading slowly must not keep it from
+    every other writer. The last line says whether the transaction was
+    committed; if it was not, none of the earlier 'ok' results took effect.
+    """
+    counts = dict.fromkeys(OPERATIONS + ('not_found', 'conflict', 'error'), 0)
+    operations = enumerate(operations)
+    with tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE, mode='w+', encoding='utf-8') as results_file:
+        try:
+            with engine.begin() as conn:
+                while True:
+                    chunk = list(islice(operations, chunk_size))
+                    if not chunk:
+                        break
+                    results = apply_chunk(conn, table, chunk)
+                    for result in results:
+                        if result['status'] == 'ok':
+                            counts[result['op']] += 1
+                        else:
+                            counts[result['status']] += 1
+                    results_file.write(''.join(json.dumps(result) + '\n' for result in results))
+        except Exception as exc:
+            summary = {'committed': False, 'error': str(exc)}
+        else:
+            summary = {'committed': True, **counts}
+        results_file.seek(0)
+        while True:
+            block = results_file.read(64 * 1024)
+            if not block:
+                break
+            yield block
+    yield json.dumps(summary) + '\n'
@@ -0,0 +1,187 @@
+import threading
+import time
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+# Media types worth compressing; images, archives and the like already are.
+COMPRESSIBLE = (
+    'text/', 'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml',
+)
+# zlib wbits: gzip framing, and the zlib framing that HTTP calls "deflate".
+WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def negotiate(accept_encoding):
+    """Return 'gzip', 'deflate' or None for an Accept-Encoding header."""
+    accepted = parse_accept_header(accept_encoding)
+    best = max(WBITS, key=lambda encoding: accepted.quality(encoding))  # gzip wins a tie
+    return best if accepted.quality(best) > 0 else None
+
+
+class _Body:
+    """Response iterable that yields ``head`` and then ``rest``.
+
+    close() is passed on to the app's own iterable even if iteration never
+    started, which a generator's close() would not do.
+    """
+
+    def __init__(self, head, rest, original):
+        self._head = head
+        self._rest = rest
+        self._original = original
+
+    def __iter__(self):
+        yield from self._head
+        yield from self._rest
+
+    def close(self):
+        if hasattr(self._original, 'close'):
+            self._original.close()
+
+
+class CompressionMiddleware:
+    """WSGI middleware that gzip- or deflate-compresses responses.
+
+    Only compressible media types of at least ``min_size`` bytes are
+    compressed; responses that already have a Content-Encoding (such as
+    precompressed static files) pass through untouched. Streamed responses,
+    those without a Content-Length, are compressed chunk by chunk with a
+    sync flush after each, so the client still gets every chunk as soon as
+    the app yields it.
+
+    ``on_compress(encoding, bytes_in, bytes_out, cpu_seconds)`` is called
+    once per compressed response, e.g. to feed metrics.
+    """
+
+    def __init__(self, app, min_size=1024, level=6, on_compress=None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.on_compress = on_compress
+        self._lock = threading.Lock()
+        self._responses = dict.fromkeys(WBITS, 0)
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._cpu_seconds = 0.0
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ['REQUEST_METHOD'] != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            # Held back until we know whether the body will be compressed.
+            captured[:] = [status, headers, exc_info]
+            return self._no_write
+
+        original = self.app(environ, capture)
+        chunks = iter(original)
+        head = []
+        if not captured:
+            # Apps may call start_response on their first chunk rather than up front.
+            head.extend(self._next(chunks))
+        status, headers, exc_info = captured
+        get = lambda name: next((value for key, value in headers if key.lower() == name), None)
+
+        content_type = (get('content-type') or '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE) or get('content-encoding'):
+            start_response(status, headers, exc_info)
+            # Returned as is when possible, so wsgi.file_wrapper still works.
+            return _Body(head, chunks, original) if head else original
+        headers = self._vary(headers)
+        length = get('content-length')
+        if (
+            encoding is None
+            or int(status.split()[0]) in (204, 206, 304)
+            or 'no-transform' in (get('cache-control') or '')
+            or (length is not None and int(length) < self.min_size)
+        ):
+            start_response(status, headers, exc_info)
+            return _Body(head, chunks, original) if head else original
+
+        # Read ahead until the body is known to be big enough to be worth it.
+        size = sum(map(len, head))
+        while length is None and size < self.min_size:
+            more = self._next(chunks)
+            if not more:
+                start_response(status, headers, exc_info)
+                return _Body(head, (), original)
+            head.extend(more)
+            size += len(more[0])
+
+        headers = [
+            (key, self._weak(value) if key.lower() == 'etag' else value)
+            for key, value in headers if key.lower() != 'content-length'
+        ]
+        headers.append(('Content-Encoding', encoding))
+        start_response(status, headers, exc_info)
+        return _Body((), self._compress(encoding, head, chunks, streamed=length is None), original)
+
+    @staticmethod
+    def _no_write(data):
+        raise RuntimeError("CompressionMiddleware does not support the WSGI write() callable")
+
+    @staticmethod
+    def _next(chunks):
+        for chunk in chunks:
+            return [chunk]
+        return []
+
+    @staticmethod
+    def _vary(headers):
+        for index, (key, value) in enumerate(headers):
+            if key.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers = headers[:index] + [(key, f"{value}, Accept-Encoding")] + headers[index + 1:]
+                return headers
+        return headers + [('Vary', 'Accept-Encoding')]
+
+    @staticmethod
+    def _weak(etag):
+        # The compressed bytes differ from the identity ones, so the tag can
+        # only promise semantic equivalence.
+        return etag if etag.startswith('W/') else f"W/{etag}"
+
+    def _compress(self, encoding, head, chunks, streamed):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for source in (head, chunks):
+                for chunk in source:
+                    if not chunk:
+                        continue
+                    start = time.thread_time()
+                    data = compressor.compress(chunk)
+                    if streamed:
+                        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                    cpu += time.thread_time() - start
+                    bytes_in += len(chunk)
+                    bytes_out += len(data)
+                    if data:
+                        yield data
+            start = time.thread_time()
+            data = compressor.flush()
+            cpu += time.thread_time() - start
+            bytes_out += len(data)
+            yield data
+        finally:
+            with self._lock:
+                self._responses[encoding] += 1
+                self._bytes_in += bytes_in
+                self._bytes_out += bytes_out
+                self._cpu_seconds += cpu
+            if self.on_compress is not None:
+                self.on_compress(encoding, bytes_in, bytes_out, cpu)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'responses': dict(self._responses),
+                'bytes_in': self._bytes_in,
+                'bytes_out': self._bytes_out,
+                'ratio': self._bytes_in / self._bytes_out if self._bytes_out else 0.0,
+                'cpu_seconds': self._cpu_seconds,
+            }
@@ -0,0 +1,114 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import insert
+
+
+class GroupCommitWriter:
+    """Merges inserts that arrive close together into one transaction.
+
+    Callers block in submit() until the batch holding their row has been
+    committed and get back their own primary key. A batch is flushed once
+    ``window`` seconds have passed since its first row arrived or it holds
+    ``max_rows`` rows, whichever comes first. The writer thread is started
+    lazily so it is created in each gunicorn worker, never in the master.
+    """
+
+    def __init__(self, engine_factory, table, window=0.005, max_rows=64):
+        self.engine_factory = engine_factory
+        self.table = table
+        self.window = window
+        self.max_rows = max_rows
+        pk = list(table.primary_key)[0]
+        self._insert = insert(table).returning(pk, sort_by_parameter_order=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._rows = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._max_wait = 0.0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Fresh queue and thread per process: neither survives a fork.
+            self._queue = queue.Queue()
+            self._reset_stats()
+            thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, values, timeout=30):
+        """Queue one row for insertion and return its new primary key."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((values, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'rows': self._rows,
+                'max_batch_size': self._max_batch,
+                'avg_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'wait_seconds_total': self._wait_total,
+                'max_wait_seconds': self._max_wait,
+                'avg_wait_seconds': self._wait_total / self._rows if self._rows else 0.0,
+            }
+
+    def _run(self):
+        engine = self.engine_factory()
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(engine, batch)
+
+    def _flush(self, engine, batch):
+        try:
+            with engine.begin() as conn:
+                keys = conn.execute(self._insert, [values for values, _, _ in batch]).scalars().all()
+        except Exception:
+            # Retry row by row so one bad row does not fail the whole batch.
+            for values, future, _ in batch:
+                try:
+                    with engine.begin() as conn:
+                        key = conn.execute(self._insert, values).scalar_one()
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(key)
+        else:
+            for (_, future, _), key in zip(batch, keys):
+                future.set_result(key)
+        self._record(batch)
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        waits = [now - enqueued for _, _, enqueued in batch]
+        with self._lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._wait_total += sum(waits)
+            self._max_wait = max(self._max_wait, max(waits))
@@ -0,0 +1,283 @@
+import bisect
+import contextlib
+import fcntl
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+# Log-spaced latency buckets: 0.5ms doubling up to ~16s.
+BUCKETS = tuple(0.0005 * 2 ** i for i in range(16))
+
+# Counters and histograms of exited processes, merged by retire_process().
+RETIRED = '_retired.json'
+
+logger = logging.getLogger('todo.metrics')
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _labels(labels):
+    # Labels read back from JSON, as the tuples _key() makes.
+    return tuple(tuple(pair) for pair in labels)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+@contextlib.contextmanager
+def _directory_lock(directory, shared):
+    # Readers take it shared, retire_process() exclusive, so a scrape never
+    # sees a retired process both in RETIRED and in its own snapshot.
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    # A temporary file of its own, so concurrent writers of the same path
+    # never truncate or rename each other's half-written file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def retire_process(directory, pid):
+    """Fold the snapshot of exited process ``pid`` into RETIRED and delete it.
+
+    Call it when a worker exits (gunicorn's child_exit), before its pid can
+    be handed to a new worker. Its gauges are dropped. Anything it counted
+    after its last flush is lost.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    with _directory_lock(directory, shared=False):
+        try:
+            snapshot = _read(path)
+        except (OSError, ValueError):
+            return  # never flushed, or already retired
+        retired_path = os.path.join(directory, RETIRED)
+        try:
+            retired = _read(retired_path)
+        except (OSError, ValueError):
+            retired = {'pid': None, 'counters': [], 'gauges': [], 'histograms': []}
+        counters = {(n, _labels(l)): v for n, l, v in retired['counters']}
+        for name, labels, value in snapshot['counters']:
+            key = (name, _labels(labels))
+            counters[key] = counters.get(key, 0) + value
+        histograms = {(n, _labels(l)): [c, s, t] for n, l, c, s, t in retired['histograms']}
+        for name, labels, counts, total, count in snapshot['histograms']:
+            merged = histograms.setdefault((name, _labels(labels)), [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+        _write(retired_path, {
+            'pid': None,
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'gauges': [],
+            'histograms': [[name, labels, *h] for (name, labels), h in histograms.items()],
+        })
+        os.remove(path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Metrics:
+    """Counters, gauges and log-bucketed histograms in Prometheus text format.
+
+    Each process keeps its numbers in memory. When ``directory`` is set a
+    background thread also writes a snapshot to ``<directory>/<pid>.json``
+    every ``flush_interval`` seconds, and render() sums the snapshots of every
+    process so the numbers cover all gunicorn workers. Exited workers keep
+    counting towards counters and histograms but not gauges: retire_process()
+    folds each one's snapshot into a single RETIRED file. The directory
+    should be emptied when the server (not a worker) starts.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._collectors = []
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._flusher = None
+        # Held by flush(): the flush thread and scrapes on other request
+        # threads all write the same snapshot file.
+        self._flush_lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._descriptions[name] = (kind, help_text)
+
+    def add_collector(self, collect):
+        """Register a callable returning (name, labels, value) counter samples.
+
+        It is called at snapshot time, for numbers other objects already keep.
+        """
+        self._collectors.append(collect)
+
+    def ensure_process(self):
+        # A forked worker must not report numbers inherited from its parent,
+        # and needs its own flush thread: threads do not survive a fork.
+        if self._pid != os.getpid() or (self.directory and self._flusher is None):
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+                if self.directory and self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True)
+                    self._flusher.start()
+
+    def _flush_forever(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # Keep flushing: one failed write (a full disk, say) must not
+                # freeze this process's numbers for the rest of its life.
+                logger.exception("Writing the metrics snapshot failed")
+
+    def inc(self, name, labels, value=1):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels, value):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = _key(name, labels)
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                counters[_key(name, labels)] = value
+        return {'pid': self._pid, 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def flush(self):
+        # Snapshot and write under one lock, so an older snapshot can never
+        # replace a newer one.
+        with self._flush_lock:
+            snapshot = self._snapshot()
+            data = {
+                'pid': snapshot['pid'],
+                'counters': [[name, labels, value] for (name, labels), value in snapshot['counters'].items()],
+                'gauges': [[name, labels, value] for (name, labels), value in snapshot['gauges'].items()],
+                'histograms': [[name, labels, *h] for (name, labels), h in snapshot['histograms'].items()],
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            _write(os.path.join(self.directory, f"{snapshot['pid']}.json"), data)
+
+    def _snapshots(self):
+        if not self.directory:
+            yield self._snapshot()
+            return
+        self.flush()
+        with _directory_lock(self.directory, shared=True):
+            files = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    files.append(_read(path))
+                except (OSError, ValueError):
+                    continue  # Being replaced by its worker right now.
+        for data in files:
+            yield {
+                'pid': data['pid'],
+                'counters': {(n, _labels(l)): v for n, l, v in data['counters']},
+                'gauges': {(n, _labels(l)): v for n, l, v in data['gauges']},
+                'histograms': {(n, _labels(l)): [c, s, t] for n, l, c, s, t in data['histograms']},
+            }
+
+    def render(self):
+        self.ensure_process()
+        counters, gauges, histograms = {}, {}, {}
+        for snapshot in self._snapshots():
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+            if snapshot['pid'] == os.getpid() or (snapshot['pid'] is not None and _pid_alive(snapshot['pid'])):
+                for key, value in snapshot['gauges'].items():
+                    gauges[key] = gauges.get(key, 0) + value
+            for key, (counts, total, count) in snapshot['histograms'].items():
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+
+        lines = []
+        families = {}
+        for kind, samples in (('counter', counters), ('gauge', gauges), ('histogram', histograms)):
+            for (name, labels), value in samples.items():
+                families.setdefault(name, (kind, []))[1].append((labels, value))
+        for name in sorted(families):
+            kind, samples = families[name]
+            kind, help_text = self._descriptions.get(name, (kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples, key=lambda sample: sample[0]):
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
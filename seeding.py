@@ -0,0 +1,88 @@
+import math
+import random
+import time
+
+# Vocabulary the generated tasks are drawn from.
+WORDS = (
+    "review update fix write call email plan book order pay clean check send prepare schedule "
+    "draft finish buy renew cancel migrate deploy test refactor document meeting report invoice "
+    "budget groceries dentist car insurance passport flight hotel team client project release "
+    "backlog design database server backup laptop garden kitchen laundry birthday gift tickets "
+    "notes slides contract proposal feedback survey training onboarding interview quarterly weekly "
+    "monthly urgent tomorrow today friday monday before after with for the and to of on in at "
+    "a new old final first next last quick long short small big important optional"
+).split()
+
+# Log-normal length distributions (median, sigma), capped at the column sizes.
+TASK_LENGTH = (28, 0.6, 200)
+DESCRIPTION_LENGTH = (90, 0.8, 500)
+
+
+def make_blob(rng, size=1 << 20):
+    """A long run of random words; rows are slices of it, which is fast."""
+    text = ' '.join(rng.choice(WORDS) for _ in range(size // 5))
+    return text[:size]
+
+
+def text_length(rng, median, sigma, cap):
+    return max(1, min(cap, int(rng.lognormvariate(math.log(median), sigma))))
+
+
+def generate_todos(rows, rng=None):
+    """Yield ``rows`` (task, description) pairs with realistic lengths."""
+    rng = rng or random.Random()
+    blob = make_blob(rng)
+    starts = [0] + [i + 1 for i, char in enumerate(blob) if char == ' ' and i < len(blob) - 600]
+    for _ in range(rows):
+        task_start = rng.choice(starts)
+        task = blob[task_start:task_start + text_length(rng, *TASK_LENGTH)].strip() or "Task"
+        description_start = rng.choice(starts)
+        description = blob[description_start:description_start + text_length(rng, *DESCRIPTION_LENGTH)].strip()
+        yield task[0].upper() + task[1:], description
+
+
+def seed_todos(conn, rows, chunk_size=50000, transaction_rows=500000, rng=None, progress=None):
+    """Insert ``rows`` generated todos through a DBAPI sqlite3 connection.
+
+    Rows go in with executemany, ``chunk_size`` at a time, committing every
+    ``transaction_rows`` rows. synchronous is switched off for the duration
+    and restored afterwards. The full-text index insert trigger is dropped
+    too, and the new rows are indexed in one pass at the end, which is
+    several times faster than indexing row by row; so nothing else should
+    be writing to the database meanwhile. Returns the elapsed seconds.
+    """
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    search_trigger = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'todo_fts_insert'"
+    ).fetchone()
+    first_new = conn.execute("SELECT COALESCE(MAX(sno), 0) + 1 FROM todo").fetchone()[0]
+    conn.commit()
+    conn.execute("PRAGMA synchronous = OFF")
+    if search_trigger:
+        conn.execute("DROP TRIGGER todo_fts_insert")
+    rows_generated = generate_todos(rows, rng)
+    start = time.perf_counter()
+    try:
+        done = pending = 0
+        while done < rows:
+            chunk = [next(rows_generated) for _ in range(min(chunk_size, rows - done))]
+            conn.executemany("INSERT INTO todo (task, description) VALUES (?, ?)", chunk)
+            done += len(chunk)
+            pending += len(chunk)
+            if pending >= transaction_rows:
+                conn.commit()
+                pending = 0
+            if progress is not None:
+                progress(done, time.perf_counter() - start)
+    finally:
+        if search_trigger:
+            # Runs even after a failure: rows missing from the index would
+            # break the update/delete triggers later.
+            conn.execute(
+                "INSERT INTO todo_fts (rowid, task, description) "
+                "SELECT sno, task, description FROM todo WHERE sno >= ?", (first_new,)
+            )
+            conn.execute(search_trigger[0])
+        conn.commit()
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    return time.perf_counter() - start
@@ -405,6 +405,92 @@ class ToDoAppTest(unittest.TestCase):
         except:
             self.log_result("test_task_ordering", False)
 
+    def test_task_count_in_heading(self):
+        """Test that the task list heading shows the total number of tasks."""
+        try:
+            self.driver.get("http://127.0.0.1:8000")
+            heading = self.driver.find_element(By.XPATH, "//div[contains(@class, 'ToDoDisplay')]/h3").text
+            self.assertRegex(heading, r"^View Tasks \(\d+\):$")
+            self.log_result("test_task_count_in_heading", True)
+        except:
+            self.log_result("test_task_count_in_heading", False)
+
+    def test_pagination_limit(self):
+        """Test that the limit query parameter caps the number of rows shown."""
+        try:
+            self.driver.get("http://127.0.0.1:8000/?limit=1")
+            task_list = self.driver.find_elements(By.XPATH, "//tbody/tr")
+            self.assertLessEqual(len(task_list), 1)
+            self.driver.get("http://127.0.0.1:8000")
+            self.log_result("test_pagination_limit", True)
+        except:
+            self.log_result("test_pagination_limit", False)
+
+    def test_search_finds_task(self):
+        """Test that a newly added task can be found through the search form."""
+        try:
+            self.driver.get("http://127.0.0.1:8000")
+            self.driver.find_element(By.ID, 'task').send_keys("Searchable Task")
+            self.driver.find_element(By.ID, 'desc').send_keys("Searchable Description")
+            self.driver.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
+            time.sleep(2)
+            search_input = self.driver.find_element(By.ID, 'search')
+            search_input.send_keys("Searchable")
+            search_input.submit()
+            time.sleep(2)
+            highlighted = self.driver.find_elements(By.XPATH, "//tbody/tr/td[2]/mark")
+            self.assertGreaterEqual(len(highlighted), 1)
+            self.driver.get("http://127.0.0.1:8000")
+            self.log_result("test_search_finds_task", True)
+        except:
+            self.log_result("test_search_finds_task", False)
+
+    def test_concurrent_update_conflict(self):
+        """Test that saving a task someone else changed meanwhile shows the conflict page."""
+        try:
+            self.driver.get("http://127.0.0.1:8000")
+            self.driver.find_element(By.XPATH, "//tbody/tr[1]/td[4]/a[1]").click()
+            first_tab = self.driver.current_window_handle
+            update_url = self.driver.current_url
+            # A second editor saves the same task first.
+            self.driver.switch_to.new_window('tab')
+            self.driver.get(update_url)
+            self.driver.find_element(By.ID, 'task').clear()
+            self.driver.find_element(By.ID, 'task').send_keys("Saved First")
+            self.driver.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
+            time.sleep(2)
+            self.driver.close()
+            self.driver.switch_to.window(first_tab)
+            self.driver.find_element(By.ID, 'task').clear()
+            self.driver.find_element(By.ID, 'task').send_keys("Saved Second")
+            self.driver.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
+            time.sleep(2)
+            heading = self.driver.find_element(By.TAG_NAME, 'h3').text
+            self.assertIn("changed while you were editing", heading)
+            self.driver.get("http://127.0.0.1:8000")
+            self.log_result("test_concurrent_update_conflict", True)
+        except:
+            self.log_result("test_concurrent_update_conflict", False)
+
+    def test_mark_task_done(self):
+        """Test that a task marked done leaves the default list but shows under all tasks."""
+        try:
+            self.driver.get("http://127.0.0.1:8000")
+            self.driver.find_element(By.ID, 'task').send_keys("Finish Me")
+            self.driver.find_element(By.ID, 'desc').send_keys("Done Description")
+            self.driver.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
+            time.sleep(2)
+            row = self.driver.find_element(By.XPATH, "//tbody/tr[td[2]='Finish Me']")
+            row.find_element(By.XPATH, ".//button[text()='Done']").click()
+            time.sleep(2)
+            self.assertEqual(len(self.driver.find_elements(By.XPATH, "//tbody/tr[td[2]='Finish Me']")), 0)
+            self.driver.get("http://127.0.0.1:8000/?show=all")
+            self.assertGreaterEqual(len(self.driver.find_elements(By.XPATH, "//tbody/tr/td[2]/s[text()='Finish Me']")), 1)
+            self.driver.get("http://127.0.0.1:8000")
+            self.log_result("test_mark_task_done", True)
+        except:
+            self.log_result("test_mark_task_done", False)
+
     
 if __name__ == "__main__":
     unittest.main()
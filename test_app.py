@@ -0,0 +1,288 @@
+"""In-process tests of the app through Flask's test client.
+
+    python -m pytest test_app.py
+
+Unlike test.py these need no running server or browser.
+"""
+import html
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from jinja2 import FileSystemLoader
+
+from app import Todo, create_app, db, init_schema, warm_up
+
+
+class AppTestCase(unittest.TestCase):
+    """Each test gets a fresh app on its own database file."""
+
+    config = {}
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='todo-test-')
+        self.app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmp, 'todo.db')}",
+            'TODO_TEMPLATE_CACHE_DIR': os.path.join(self.tmp, 'jinja-cache'),
+            **self.config,
+        })
+        with self.app.app_context():
+            init_schema()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def create(self, task, desc="description"):
+        response = self.client.post('/', data={'task': task, 'desc': desc}, headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 201)
+        return response.json['sno']
+
+
+class RowCacheTest(AppTestCase):
+
+    def test_hostile_task_text(self):
+        hostile = ["evil\0index\0x", "<!--todo-index-->", "a<!--todo-next-->b", "</td><script>alert(1)</script>"]
+        for task in hostile:
+            self.create(task)
+        for _ in range(2):  # rendered, then from the row cache
+            response = self.client.get('/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(b'<script>', response.data)
+            self.assertIn(b'&lt;!--todo-index--&gt;', response.data)
+            self.assertEqual(response.data.count(b'<tr>'), len(hostile) + 1)  # + the header row
+
+    def test_row_changes_are_rendered(self):
+        sno = self.create("first")
+        self.client.get('/?show=all')
+        self.client.post(f'/toggle/{sno}', data={'done': '1', 'next': '/?show=all'})
+        self.assertIn(b'<s>first</s>', self.client.get('/?show=all').data)
+
+
+class RowCacheOffTest(RowCacheTest):
+    config = {'TODO_ROW_CACHE': False}
+
+
+class StreamIndexTest(AppTestCase):
+    config = {'TODO_STREAM_INDEX': True, 'TODO_STREAM_CHUNK_SIZE': 4096, 'TODO_ROW_BATCH_SIZE': 5}
+
+    def add_tasks(self, count):
+        with self.app.app_context():
+            db.session.execute(db.insert(Todo), [{'task': f"task {i}", 'description': "x"} for i in range(1, count + 1)])
+            db.session.commit()
+
+    def chunks(self, path):
+        response = self.client.get(path, buffered=False)
+        try:
+            self.assertEqual(response.status_code, 200)
+            return list(response.iter_encoded())
+        finally:
+            response.close()
+
+    def test_rows_arrive_in_chunks_after_the_head(self):
+        self.add_tasks(100)
+        chunks = self.chunks('/?limit=100')
+        self.assertGreater(len(chunks), 5)
+        self.assertIn(b'navbar-brand', chunks[0])
+        self.assertNotIn(b'task 100<', chunks[0])
+        self.assertIn(b'task 100<', chunks[-1] + chunks[-2])
+        # A chunk is cut at the first event past the size, never a whole page.
+        self.assertLess(max(map(len, chunks)), 2 * 4096)
+
+    def page(self, path):
+        """Return the task names and the Previous/Next links of a streamed page."""
+        body = b''.join(self.chunks(path)).decode()
+        links = {label: html.unescape(href) for href, label in re.findall(r'href="([^"]*)">(Previous|Next)<', body)}
+        return re.findall(r'<td>(task \d+)</td>', body), links
+
+    def test_previous_and_next_cursors(self):
+        self.add_tasks(12)
+        tasks, links = self.page('/?limit=5')
+        self.assertEqual(tasks, [f"task {i}" for i in range(1, 6)])
+        self.assertEqual(links, {'Next': '/?after=5&limit=5'})
+        tasks, links = self.page(links['Next'])
+        self.assertEqual(tasks, [f"task {i}" for i in range(6, 11)])
+        self.assertEqual(links, {'Previous': '/?before=6&limit=5', 'Next': '/?after=10&limit=5'})
+        tasks, last_links = self.page(links['Next'])
+        self.assertEqual(tasks, ["task 11", "task 12"])
+        self.assertEqual(last_links, {'Previous': '/?before=11&limit=5'})
+        tasks, links = self.page(links['Previous'])
+        self.assertEqual(tasks, [f"task {i}" for i in range(1, 6)])
+        self.assertEqual(links, {'Next': '/?after=5&limit=5'})
+
+    def test_matches_the_buffered_page(self):
+        self.add_tasks(30)
+        streamed = b''.join(self.chunks('/?limit=20&after=3'))
+        self.app.config['TODO_STREAM_INDEX'] = False
+        self.assertEqual(streamed, self.client.get('/?limit=20&after=3').data)
+
+
+class CursorArgsTest(AppTestCase):
+
+    def test_out_of_range_cursors_are_rejected(self):
+        self.create("task")
+        for query in ['after=99999999999999999999', 'before=99999999999999999999', 'after=-5', 'before=-1',
+                      'after=9223372036854775807']:
+            self.assertEqual(self.client.get(f'/?{query}').status_code, 400, query)
+
+    def test_largest_cursors_work(self):
+        self.create("task")
+        page = self.client.get('/?after=9223372036854775806')
+        self.assertEqual(page.status_code, 200)
+        self.assertIn(b'before=9223372036854775807', page.data)
+        self.assertEqual(self.client.get('/?before=9223372036854775807').status_code, 200)
+        self.assertEqual(self.client.get('/?after=abc').status_code, 200)
+
+
+class TemplateCacheTest(AppTestCase):
+
+    def test_precompiled_templates_load_from_another_directory(self):
+        result = self.app.test_cli_runner().invoke(args=['precompile-templates'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        cache_dir = os.path.join(self.tmp, 'jinja-cache')
+        names = self.app.jinja_env.list_templates()
+        self.assertEqual(len(os.listdir(cache_dir)), len(names))
+
+        # The app runs from somewhere other than where the cache was built.
+        moved = shutil.copytree(self.app.jinja_loader.searchpath[0], os.path.join(self.tmp, 'moved'))
+        fresh = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': self.app.config['SQLALCHEMY_DATABASE_URI'],
+            'TODO_TEMPLATE_CACHE_DIR': cache_dir,
+        })
+        fresh.jinja_loader = FileSystemLoader(moved)
+        with mock.patch.object(fresh.jinja_env, 'compile', side_effect=AssertionError("compiled")):
+            for name in names:
+                fresh.jinja_env.get_template(name)
+
+    def test_changed_template_is_recompiled(self):
+        self.app.test_cli_runner().invoke(args=['precompile-templates'])
+        moved = shutil.copytree(self.app.jinja_loader.searchpath[0], os.path.join(self.tmp, 'moved'))
+        with open(os.path.join(moved, '404.html'), 'a') as f:
+            f.write("<!-- changed -->")
+        self.app.jinja_loader = FileSystemLoader(moved)
+        self.app.jinja_env.cache.clear()
+        with self.app.test_request_context():
+            self.assertIn("<!-- changed -->", self.app.jinja_env.get_template('404.html').render())
+
+
+class TaskIdentityTest(AppTestCase):
+
+    def test_deleted_sno_is_not_reused(self):
+        sno = self.create("original")
+        page = self.client.get(f'/update/{sno}')
+        self.client.get(f'/delete/{sno}')
+        self.assertNotEqual(self.create("replacement"), sno)
+        revalidated = self.client.get(f'/update/{sno}', headers={'If-None-Match': page.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 404)
+        stale = self.client.post(f'/update/{sno}', data={'task': "stale", 'desc': "x", 'version': '1'})
+        self.assertEqual(stale.status_code, 404)
+        self.assertNotIn(b'stale', self.client.get('/').data)
+
+
+class UpdateVersionTest(AppTestCase):
+
+    def test_malformed_version_is_rejected(self):
+        sno = self.create("original")
+        for version in ['abc', '', '1.5', '99999999999999999999']:
+            response = self.client.post(f'/update/{sno}', data={'task': "changed", 'desc': "x", 'version': version})
+            self.assertEqual(response.status_code, 400, version)
+        self.assertEqual(self.client.post(f'/update/{sno}', data={'task': "stale", 'desc': "x", 'version': '7'}).status_code, 409)
+        self.assertEqual(self.client.post(f'/update/{sno}', data={'task': "changed", 'desc': "x", 'version': '1'}).status_code, 302)
+        self.assertEqual(self.client.post(f'/update/{sno}', data={'task': "no version", 'desc': "x"}).status_code, 302)
+        self.assertIn(b'no version', self.client.get('/').data)
+
+
+class ToggleTest(AppTestCase):
+
+    def test_redirects_only_within_the_site(self):
+        sno = self.create("task")
+        for target in ['//evil.example', '///evil.example', '/\\evil.example', '/\t/evil.example',
+                       'https://evil.example/', 'javascript:alert(1)']:
+            response = self.client.post(f'/toggle/{sno}', data={'done': '1', 'next': target})
+            self.assertEqual(response.headers['Location'], '/', target)
+        response = self.client.post(f'/toggle/{sno}', data={'done': '0', 'next': '/?show=all'})
+        self.assertEqual(response.headers['Location'], '/?show=all')
+
+
+class SearchTest(AppTestCase):
+
+    def test_completed_tasks_show_as_done(self):
+        sno = self.create("finished report")
+        self.create("open report")
+        self.client.post(f'/toggle/{sno}', data={'done': '1'})
+        page = self.client.get('/search?q=report').data
+        self.assertIn(b'<s>finished <mark>report</mark></s>', page)
+        self.assertEqual(page.count(b'>Reopen<'), 1)
+        self.assertEqual(page.count(b'>Done<'), 1)
+
+    def test_page_numbers(self):
+        self.create("report")
+        for query in ['page=99999999999999999999', 'page=9223372036854775807', 'page=0', 'page=-1']:
+            self.assertEqual(self.client.get(f'/search?q=report&{query}').status_code, 400, query)
+        self.assertNotIn(b'<mark>', self.client.get('/search?q=report&page=2').data)
+        self.assertIn(b'<mark>', self.client.get('/search?q=report&page=abc').data)
+
+
+class SearchCandidatesTest(AppTestCase):
+    config = {'TODO_SEARCH_CANDIDATES': 3}
+
+    def test_only_the_newest_matches_are_ranked(self):
+        for i in range(1, 6):
+            self.create(f"report {i}", "quarterly report" if i == 1 else "x")
+        page = self.client.get('/search?q=report').data.decode()
+        found = sorted(re.findall(r'<mark>report</mark> (\d)', page))
+        self.assertEqual(found, ['3', '4', '5'])
+
+
+class QueryTimingTest(AppTestCase):
+
+    def test_failed_statements_leave_no_timer(self):
+        with self.app.app_context():
+            conn = db.session.connection()
+            for _ in range(3):
+                with self.assertRaises(Exception):
+                    conn.exec_driver_sql("SELECT * FROM no_such_table")
+            self.assertEqual(conn.info.get('query_start'), [])
+
+    def test_warm_up_is_not_counted(self):
+        warm_up(self.app)
+        samples = self.client.get('/metrics').data.decode().splitlines()
+        self.assertEqual([line for line in samples if line.startswith('todo_sql_')], [])
+
+
+class TwoAppsTest(unittest.TestCase):
+    """Apps built in one process share no caches, writers or metrics."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='todo-test-')
+        self.apps = []
+        for name in ('a', 'b'):
+            app = create_app('testing', {
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmp, name + '.db')}",
+                'TODO_GROUP_COMMIT': True,
+            })
+            with app.app_context():
+                init_schema()
+            self.apps.append(app)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_apps_are_independent(self):
+        a, b = (app.test_client() for app in self.apps)
+        response = a.post('/', data={'task': 'only in a', 'desc': 'x'}, headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 201)
+        b.post('/', data={'task': 'only in b', 'desc': 'y'}, headers={'Accept': 'application/json'})
+        page_a, page_b = a.get('/').data, b.get('/').data  # both at data version 1
+        self.assertIn(b'only in a', page_a)
+        self.assertNotIn(b'only in b', page_a)
+        self.assertIn(b'only in b', page_b)
+        self.assertNotIn(b'only in a', page_b)
+        self.assertEqual(a.get('/admin/group-commit').json['rows'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
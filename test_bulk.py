@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from app import Todo, create_app, db, init_schema
+from bulk import apply_bulk, iter_json_array, iter_ndjson
+
+
+def parse_array(data, chunk_size):
+    return list(iter_json_array(io.BytesIO(data), chunk_size=chunk_size))
+
+
+class IterJsonArrayTest(unittest.TestCase):
+
+    def assert_parses_in_any_chunks(self, data, expected):
+        # Chunk sizes from 1 byte up put a chunk boundary at every offset.
+        for chunk_size in range(1, len(data) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(parse_array(data, chunk_size), expected)
+
+    def test_numbers_split_across_chunks(self):
+        self.assert_parses_in_any_chunks(
+            b'[2.5, 1.25e3, -7, 0, 10, 3E-2,100]',
+            [2.5, 1250.0, -7, 0, 10, 0.03, 100],
+        )
+
+    def test_literals_and_nesting(self):
+        self.assert_parses_in_any_chunks(
+            b' [ true ,false,null, {"a": [1, {"b": "]"}]}, "x,y" ] ',
+            [True, False, None, {'a': [1, {'b': ']'}]}, "x,y"],
+        )
+
+    def test_multibyte_utf8_split_across_chunks(self):
+        items = [{'op': 'create', 'task': "café € \U0001f600", 'description': "日本語"}]
+        self.assert_parses_in_any_chunks(json.dumps(items, ensure_ascii=False).encode(), items)
+
+    def test_empty_array(self):
+        self.assert_parses_in_any_chunks(b'[ ]', [])
+
+    def test_malformed_input(self):
+        for data in (b'{"op": "create"}', b'[1, 2', b'[1 2]', b'[1,, 2]', b'[{"a": 1]'):
+            for chunk_size in (1, 3, 64):
+                with self.subTest(data=data, chunk_size=chunk_size), self.assertRaises(ValueError):
+                    parse_array(data, chunk_size)
+
+
+class IterNdjsonTest(unittest.TestCase):
+
+    def test_bad_lines_become_errors(self):
+        values = list(iter_ndjson(io.BytesIO(b'{"op": "delete", "sno": 1}\n\nnot json\n[1]\n')))
+        self.assertEqual(values[0], {'op': 'delete', 'sno': 1})
+        self.assertIsInstance(values[1], ValueError)
+        self.assertEqual(values[2], [1])
+
+
+class ApplyBulkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='todo-test-')
+        self.app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmp, 'todo.db')}"})
+        self.context = self.app.app_context()
+        self.context.push()
+        init_schema()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def apply(self, operations, chunk_size=1000):
+        lines = ''.join(apply_bulk(db.engine, Todo.__table__, operations, chunk_size)).splitlines()
+        return [json.loads(line) for line in lines[:-1]], json.loads(lines[-1])
+
+    def tasks(self):
+        return {row.sno: (row.task, row.version) for row in db.session.execute(db.select(Todo.sno, Todo.task, Todo.version))}
+
+    def test_creates(self):
+        results, summary = self.apply([{'op': 'create', 'task': f"t{i}", 'description': ""} for i in range(3)])
+        self.assertEqual([result['sno'] for result in results], [1, 2, 3])
+        self.assertEqual(summary, {'committed': True, 'create': 3, 'update': 0, 'delete': 0,
+                                   'not_found': 0, 'conflict': 0, 'error': 0})
+
+    def check_mixed_runs(self, chunk_size):
+        self.apply([{'op': 'create', 'task': f"t{i}", 'description': ""} for i in range(3)])
+        results, summary = self.apply([
+            {'op': 'update', 'sno': 1, 'task': "one", 'description': ""},
+            {'op': 'update', 'sno': 1, 'task': "one again", 'description': "", 'version': 2},
+            {'op': 'update', 'sno': 2, 'task': "stale", 'description': "", 'version': 7},
+            {'op': 'update', 'sno': 99, 'task': "missing", 'description': ""},
+            {'op': 'delete', 'sno': 3},
+            {'op': 'delete', 'sno': 3},
+            {'op': 'create', 'task': "four", 'description': ""},
+            {'op': 'explode'},
+            ValueError("bad line"),
+            {'op': 'delete', 'sno': 2},
+        ], chunk_size=chunk_size)
+        self.assertEqual([result['status'] for result in results],
+                         ['ok', 'ok', 'conflict', 'not_found', 'ok', 'not_found', 'ok', 'error', 'error', 'ok'])
+        self.assertEqual([result['index'] for result in results], list(range(10)))
+        self.assertEqual(results[1]['version'], 3)
+        self.assertEqual(results[2]['version'], 1)
+        self.assertEqual(summary, {'committed': True, 'create': 1, 'update': 2, 'delete': 2,
+                                   'not_found': 2, 'conflict': 1, 'error': 2})
+        self.assertEqual(self.tasks(), {1: ("one again", 3), 4: ("four", 1)})
+
+    def test_mixed_runs(self):
+        self.check_mixed_runs(chunk_size=1000)
+
+    def test_mixed_runs_cut_by_chunks(self):
+        self.check_mixed_runs(chunk_size=3)
+
+    def test_write_lock_is_released_before_results_are_sent(self):
+        results = apply_bulk(db.engine, Todo.__table__, ({'op': 'create', 'task': f"t{i}", 'description': ""}
+                                                        for i in range(50)), chunk_size=10)
+        self.assertIn('"sno": 1', next(results))
+        # The client has its first results and has not read the rest yet.
+        other = sqlite3.connect(db.engine.url.database, timeout=0)
+        try:
+            other.execute("INSERT INTO todo (task, description, version, done) VALUES ('other', '', 1, 0)")
+            other.commit()
+        finally:
+            other.close()
+        self.assertTrue(json.loads(list(results)[-1])['committed'])
+
+    def test_endpoint(self):
+        body = b''.join(json.dumps({'op': 'create', 'task': f"t{i}", 'description': ""}).encode() + b'\n'
+                        for i in range(5))
+        response = self.app.test_client().post('/api/todos/bulk', data=body, content_type='application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual([line['sno'] for line in lines[:-1]], [1, 2, 3, 4, 5])
+        self.assertEqual(lines[-1]['create'], 5)
+
+    def test_failure_rolls_back_everything(self):
+        self.apply([{'op': 'create', 'task': "keep", 'description': ""}])
+        results, summary = self.apply([
+            {'op': 'update', 'sno': 1, 'task': "changed", 'description': ""},
+            {'op': 'create', 'task': "x" * 10, 'description': None},  # per-item error, not a failure
+        ])
+        self.assertTrue(summary['committed'])
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TRIGGER fail BEFORE INSERT ON todo BEGIN SELECT RAISE(ABORT, 'no'); END")
+        results, summary = self.apply([
+            {'op': 'update', 'sno': 1, 'task': "lost", 'description': ""},
+            {'op': 'create', 'task': "never", 'description': ""},
+        ])
+        self.assertFalse(summary['committed'])
+        self.assertEqual(self.tasks(), {1: ("changed", 2)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import gzip
+import unittest
+import zlib
+
+from compression import CompressionMiddleware, negotiate
+
+BODY = b"<p>A todo worth compressing.</p>\n" * 100
+
+
+class ClosingBody:
+    """A response iterable that records whether close() was called."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def make_app(chunks=(BODY,), status='200 OK', headers=(), length=True, content_type='text/html; charset=utf-8'):
+    body = ClosingBody(list(chunks))
+
+    def app(environ, start_response):
+        response_headers = [('Content-Type', content_type), *headers]
+        if length:
+            response_headers.append(('Content-Length', str(sum(map(len, body.chunks)))))
+        start_response(status, response_headers)
+        return body
+
+    app.body = body
+    return app
+
+
+class CompressionMiddlewareTest(unittest.TestCase):
+
+    def request(self, app, method='GET', accept_encoding='gzip, deflate', **kwargs):
+        """Call the middleware and return (status, headers, body chunks)."""
+        middleware = CompressionMiddleware(app, **kwargs)
+        started = []
+        environ = {'REQUEST_METHOD': method, 'HTTP_ACCEPT_ENCODING': accept_encoding}
+        result = middleware(environ, lambda status, headers, exc_info=None: started.append((status, headers)))
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        self.assertTrue(app.body.closed)
+        status, headers = started[0]
+        return status, {key.lower(): value for key, value in headers}, chunks
+
+    def test_large_body_is_gzipped(self):
+        calls = []
+        app = make_app(headers=[('ETag', '"abc"')])
+        status, headers, chunks = self.request(app, on_compress=lambda *args: calls.append(args))
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertNotIn('content-length', headers)
+        self.assertEqual(headers['etag'], 'W/"abc"')
+        self.assertEqual(headers['vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(chunks)), BODY)
+        [(encoding, bytes_in, bytes_out, _)] = calls
+        self.assertEqual((encoding, bytes_in, bytes_out), ('gzip', len(BODY), len(b''.join(chunks))))
+
+    def test_deflate_when_gzip_is_refused(self):
+        _, headers, chunks = self.request(make_app(), accept_encoding='gzip;q=0, deflate')
+        self.assertEqual(headers['content-encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(b''.join(chunks)), BODY)
+
+    def test_small_body_is_not_compressed(self):
+        _, headers, chunks = self.request(make_app([b"tiny"]))
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(headers['content-length'], '4')
+        self.assertEqual(headers['vary'], 'Accept-Encoding')
+        self.assertEqual(b''.join(chunks), b"tiny")
+
+    def test_streamed_body_is_flushed_chunk_by_chunk(self):
+        parts = [b"<tr>%d</tr>\n" % i * 60 for i in range(4)]
+        _, headers, chunks = self.request(make_app(parts, length=False), min_size=500)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        # Each chunk sent decodes to what the app had yielded by then, so a
+        # client sees every row without waiting for the end of the body.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(len(chunks), len(parts) + 1)
+        for part, chunk in zip(parts, chunks):
+            self.assertEqual(decompressor.decompress(chunk), part)
+        self.assertEqual(decompressor.decompress(chunks[-1]) + decompressor.flush(), b"")
+        self.assertTrue(decompressor.eof)
+
+    def test_short_streamed_body_is_not_compressed(self):
+        parts = [b"a" * 10, b"b" * 10]
+        _, headers, chunks = self.request(make_app(parts, length=False))
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(b''.join(chunks), b''.join(parts))
+
+    def test_head_is_not_compressed(self):
+        _, headers, _ = self.request(make_app(), method='HEAD')
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(headers['content-length'], str(len(BODY)))
+
+    def test_not_modified_is_not_compressed(self):
+        app = make_app([], status='304 Not Modified', headers=[('ETag', '"abc"')], length=False)
+        status, headers, chunks = self.request(app)
+        self.assertEqual(status, '304 Not Modified')
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(headers['etag'], '"abc"')
+        self.assertEqual(chunks, [])
+
+    def test_existing_content_encoding_passes_through(self):
+        precompressed = gzip.compress(BODY)
+        app = make_app([precompressed], headers=[('Content-Encoding', 'gzip')])
+        _, headers, chunks = self.request(app)
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertEqual(b''.join(chunks), precompressed)
+
+    def test_no_transform_is_respected(self):
+        app = make_app(headers=[('Cache-Control', 'public, no-transform'), ('ETag', '"abc"')])
+        _, headers, chunks = self.request(app)
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(headers['etag'], '"abc"')
+        self.assertEqual(b''.join(chunks), BODY)
+
+    def test_incompressible_type_is_left_alone(self):
+        _, headers, chunks = self.request(make_app(content_type='image/png'))
+        self.assertNotIn('content-encoding', headers)
+        self.assertNotIn('vary', headers)
+        self.assertEqual(b''.join(chunks), BODY)
+
+    def test_existing_vary_is_extended(self):
+        _, headers, _ = self.request(make_app(headers=[('Vary', 'Cookie')]))
+        self.assertEqual(headers['vary'], 'Cookie, Accept-Encoding')
+
+    def test_identity_only_client(self):
+        _, headers, chunks = self.request(make_app(), accept_encoding='identity')
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(b''.join(chunks), BODY)
+
+
+class NegotiateTest(unittest.TestCase):
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate('deflate;q=1, gzip;q=0.5'), 'deflate')
+        self.assertEqual(negotiate('*'), 'gzip')
+        self.assertIsNone(negotiate('gzip;q=0, deflate;q=0'))
+        self.assertIsNone(negotiate(''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import re
+import tempfile
+import threading
+import time
+import unittest
+
+from metrics import RETIRED, Metrics, retire_process
+
+DEAD_PID = 2 ** 22 + 1  # above Linux's pid_max, so never a live process
+
+
+class RetireProcessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='todo-metrics-')
+        self.metrics = Metrics(self.directory)
+        self.metrics.describe('requests_total', 'counter', "Requests.")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_dead_worker(self, requests, in_flight):
+        with open(os.path.join(self.directory, f"{DEAD_PID}.json"), 'w') as f:
+            json.dump({
+                'pid': DEAD_PID,
+                'counters': [['requests_total', [['status', '200']], requests]],
+                'gauges': [['in_flight', [], in_flight]],
+                'histograms': [['latency', [], [1] + [0] * 16, 0.1, 1]],
+            }, f)
+
+    def test_retired_counts_are_kept_and_the_snapshot_removed(self):
+        self.metrics.inc('requests_total', {'status': '200'}, 1)
+        self.write_dead_worker(requests=5, in_flight=2)
+        retire_process(self.directory, DEAD_PID)
+        # The pid comes back as a new worker, which starts counting from zero.
+        self.write_dead_worker(requests=3, in_flight=1)
+        retire_process(self.directory, DEAD_PID)
+        retire_process(self.directory, DEAD_PID)  # already gone: no-op
+
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.json')], [RETIRED])
+        text = self.metrics.render()
+        self.assertIn('requests_total{status="200"} 9\n', text)
+        self.assertIn('latency_count 2\n', text)
+        self.assertNotIn('in_flight', text)
+
+
+class ConcurrentScrapeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='todo-metrics-')
+        self.metrics = Metrics(self.directory, flush_interval=0.001)
+        self.metrics.describe('requests_total', 'counter', "Requests.")
+
+    def tearDown(self):
+        self.metrics._pid = None  # stops the flush thread
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_scrapes_race_the_flush_thread(self):
+        self.metrics.inc('requests_total', {}, 1)
+        self.metrics.ensure_process()
+        errors, seen = [], []
+        deadline = time.monotonic() + 1.0
+
+        def scrape():
+            last = 0
+            try:
+                while time.monotonic() < deadline:
+                    self.metrics.inc('requests_total', {}, 1)
+                    value = int(re.search(r'^requests_total (\d+)$', self.metrics.render(), re.M).group(1))
+                    # Counters never go backwards, and each scrape sees its own count.
+                    self.assertGreater(value, last)
+                    last = value
+                seen.append(last)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=scrape) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(seen), 4)
+        self.assertTrue(self.metrics._flusher.is_alive())
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()